@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+"""
+Description:
+Unit tests for the resource entity parsers of transupdate.py (-ha entity).
+
+Usage:
+python -m unittest test_transupdate
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import transupdate
+
+
+class HTMLEntitiesTest(unittest.TestCase):
+
+    def parse(self, text):
+        return [value for __, value in transupdate._parse_html_entities(text)]
+
+    def test_inline_markup_stays_in_segment(self):
+        self.assertEqual(self.parse(u'<p>Click <b>Save</b> now</p>'), [u'Click <b>Save</b> now'])
+        self.assertEqual(self.parse(u'<p>Click <a href="/a">Save</a> now</p>'), [u'Click <a href="/a">Save</a> now'])
+
+    def test_inline_changes_are_changes(self):
+        variants = [u'<p>Click <b>Save</b> now</p>', u'<p>Click <a href="/a">Save</a> now</p>',
+                    u'<p>Click <a href="/b">Save</a> now</p>', u'<p>Click Save now</p>']
+        self.assertEqual(len(set(tuple(self.parse(variant)) for variant in variants)), len(variants))
+
+    def test_block_elements_split_segments(self):
+        self.assertEqual(self.parse(u'<div><h1>Title</h1>\n<p>One<br/>line</p><ul><li>A</li><li>B</li></ul></div>'),
+                         [u'Title', u'One<br/>line', u'A', u'B'])
+
+    def test_whitespace_collapsed(self):
+        self.assertEqual(self.parse(u'<p>  Click\n   <em>here</em>  </p>'), [u'Click <em>here</em>'])
+
+    def test_attributes_and_skipped_tags(self):
+        self.assertEqual(self.parse(u'<script>var s = "x";</script><input placeholder="Name"><style>p {}</style><p>Hi &amp; bye</p>'),
+                         [u'Name', u'Hi & bye'])
+
+    def test_markup_only_segment_ignored(self):
+        self.assertEqual(self.parse(u'<p><img src="logo.png"></p>'), [])
+
+
+class EntityParsersTest(unittest.TestCase):
+
+    def test_po_skips_header_and_comments(self):
+        text = (u'msgid ""\nmsgstr "Language: de\\n"\n\n'
+                u'# comment\n#, fuzzy\nmsgctxt "menu"\nmsgid "Open"\nmsgstr "\xd6ffnen"\n\n'
+                u'msgid "file"\nmsgid_plural "files"\nmsgstr[0] "Datei"\nmsgstr[1] "Da"\n"teien"\n')
+        self.assertEqual(transupdate._parse_po_entities(text),
+                         [[[u'menu', u'Open'], [u'', True, u'\xd6ffnen']],
+                          [[u'', u'file'], [u'files', False, u'Datei', u'Dateien']]])
+
+    def test_properties_continuations_and_escapes(self):
+        text = u'# comment\nkey1 = one \\\n    two\nkey\\ 2:\\u00e9\\t\n! other\nkey3\n'
+        self.assertEqual(transupdate._parse_properties_entities(text),
+                         [[u'key1', u'one two'], [u'key 2', u'\xe9\t'], [u'key3', u'']])
+
+    def test_json_chrome_messages(self):
+        text = u'{"a": {"message": "A", "description": "d"}, "b": {"c": ["x", "y"]}}'
+        self.assertEqual(sorted(transupdate._parse_json_entities(text)),
+                         [[[u'a'], u'A'], [[u'b', u'c', 0], u'x'], [[u'b', u'c', 1], u'y']])
+
+    def test_strings_comments_dropped(self):
+        text = u'/* comment = "x"; */\n"key" = "va\\"lue";\n// "other" = "y";\n"k2"="v2";\n'
+        self.assertEqual(transupdate._parse_strings_entities(text), [[u'key', u'va\\"lue'], [u'k2', u'v2']])
+
+    def test_android_keeps_markup(self):
+        text = (u'<resources><string name="a">Tap <b>Save</b></string><string name="b" translatable="false">x</string>'
+                u'<plurals name="p"><item quantity="one">1 file</item><item quantity="other">%d files</item></plurals></resources>')
+        self.assertEqual(transupdate._parse_android_entities(text),
+                         [[[u'a'], u'Tap <b>Save</b>'], [[u'p', u'one'], u'1 file'], [[u'p', u'other'], u'%d files']])
+
+
+class EntityFingerprintTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def fingerprint(self, name, content):
+        filename = os.path.join(self.folder, name)
+        with open(filename, "wb") as fp:
+            fp.write(content)
+        return transupdate.compute_entity_fingerprint(filename)
+
+    def test_reordering_and_comments_ignored(self):
+        self.assertEqual(self.fingerprint("a.properties", "# one\na=1\nb=2\n"), self.fingerprint("b.properties", "b = 2\na = 1\n"))
+        self.assertNotEqual(self.fingerprint("a.properties", "a=1\n"), self.fingerprint("b.properties", "a=2\n"))
+
+    def test_html_link_change_detected(self):
+        self.assertNotEqual(self.fingerprint("a.html", '<p>Click <a href="/a">Save</a> now</p>'),
+                            self.fingerprint("b.html", '<p>Click <a href="/b">Save</a> now</p>'))
+
+    def test_unparseable_falls_back_to_bytes(self):
+        self.assertTrue(self.fingerprint("a.json", "{not json").startswith("b:"))
+        self.assertTrue(self.fingerprint("b.json", '{"a": "b"}').startswith("e:"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+
+"""
+Description:
+Local stand-in for the Transifex API v2 endpoints used by transupdate.py, for offline testing and benchmarking.
+
+Usage:
+transifex_mock.py -p 8099 -l 0.05 -e 0.01 -ps 20000
+transupdate.py ... -tu http://localhost:8099
+"""
+
+import argparse
+import BaseHTTPServer
+import json
+import random
+import re
+import SocketServer
+import sys
+import threading
+import time
+import urlparse
+
+
+class MockTransifexState(object):
+    """
+    In-memory projects/resources plus request counters.
+    Projects are created on first access unless a fixed project list is given.
+    """
+    SOURCE_LANG = "en"
+
+    def __init__(self, projects=None, langs=None, payload_size=4096):
+        self._lock = threading.Lock()
+        self._auto_create = not projects
+        self._projects = dict((slug, {}) for slug in (projects or []))
+        self.langs = langs or []
+        self.payload_size = payload_size
+        self.reset_counters()
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = {}
+            self.errors = 0
+            self.bytes_sent = 0
+            self.bytes_received = 0
+            self.started = time.time()
+
+    def count(self, call_type, bytes_received):
+        with self._lock:
+            self.requests[call_type] = self.requests.get(call_type, 0) + 1
+            self.bytes_received += bytes_received
+
+    def count_sent(self, bytes_sent, error=False):
+        with self._lock:
+            self.bytes_sent += bytes_sent
+            if error:
+                self.errors += 1
+
+    def counters(self):
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "total_requests": sum(self.requests.values()),
+                "errors": self.errors,
+                "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received,
+                "elapsed": time.time() - self.started
+                }
+
+    def project(self, project_slug):
+        with self._lock:
+            if project_slug not in self._projects and self._auto_create:
+                self._projects[project_slug] = {}
+            return self._projects.get(project_slug)
+
+    def put_resource(self, project_slug, resource_slug, name, i18n_type, content):
+        with self._lock:
+            resources = self._projects.setdefault(project_slug, {})
+            resource = resources.setdefault(resource_slug, {"revision": 0, "translations": {}})
+            resource.update({"name": name, "slug": resource_slug, "i18n_type": i18n_type, "content": content})
+            resource["revision"] += 1
+            return resource
+
+    def get_resource(self, project_slug, resource_slug):
+        project = self.project(project_slug)
+        if project is None:
+            return None
+        with self._lock:
+            if resource_slug not in project and self._auto_create:
+                # downloads may be benchmarked without a prior upload
+                project[resource_slug] = {"name": resource_slug, "slug": resource_slug, "i18n_type": "PO",
+                                          "content": "", "revision": 1, "translations": {}}
+            return project.get(resource_slug)
+
+    def touch(self, project_slug, resource_slug, lang):
+        """ Simulate a translator change to one resource/lang """
+        resource = self.get_resource(project_slug, resource_slug)
+        with self._lock:
+            resource["translations"][lang] = resource["translations"].get(lang, 0) + 1
+
+    def _translation_revision(self, resource, lang):
+        return resource["revision"] + resource["translations"].get(lang, 0)
+
+    def translation(self, resource, lang):
+        revision = self._translation_revision(resource, lang)
+        lines = []
+        size = 0
+        i = 0
+        while size < self.payload_size:
+            line = 'msgid "%s_%d"\nmsgstr "%s %s r%d %d"\n\n' % (resource["slug"], i, lang, resource["slug"], revision, i)
+            lines.append(line)
+            size += len(line)
+            i += 1
+        return "".join(lines)
+
+    def stats(self, resource, lang):
+        revision = self._translation_revision(resource, lang)
+        translated = 10 + revision % 90
+        return {
+            "completed": "%d%%" % translated,
+            "translated_words": translated * 3,
+            "untranslated_words": (100 - translated) * 3,
+            "translated_entities": translated,
+            "untranslated_entities": 100 - translated,
+            "reviewed": 0,
+            "reviewed_percentage": "0%",
+            "last_commiter": "mock",
+            "last_update": "2016-01-01 00:00:%02d.%06d" % (revision % 60, revision)
+            }
+
+    def source_stats(self, resource):
+        return {
+            "completed": "100%",
+            "translated_entities": 100,
+            "untranslated_entities": 0,
+            "last_commiter": "mock",
+            "last_update": "2016-01-01 00:00:%02d.%06d" % (resource["revision"] % 60, resource["revision"])
+            }
+
+    def all_stats(self, resource):
+        """ Like Transifex, the bulk stats include the source language """
+        stats = dict((lang, self.stats(resource, lang)) for lang in self.langs)
+        stats[self.SOURCE_LANG] = self.source_stats(resource)
+        return stats
+
+
+class MockTransifexHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    _routes = [
+        ("GET", re.compile(r"^/api/2/project/([^/]+)/$"), "project_exists"),
+        ("GET", re.compile(r"^/api/2/project/([^/]+)/resources/$"), "list_resources"),
+        ("POST", re.compile(r"^/api/2/project/([^/]+)/resources/$"), "new_resource"),
+        ("PUT", re.compile(r"^/api/2/project/([^/]+)/resource/([^/]+)/content/$"), "update_source_translation"),
+        ("GET", re.compile(r"^/api/2/project/([^/]+)/resource/([^/]+)/translation/([^/]+)/$"), "get_translation"),
+        ("GET", re.compile(r"^/api/2/project/([^/]+)/resource/([^/]+)/stats/([^/]+)/$"), "get_statistics"),
+        ("GET", re.compile(r"^/api/2/project/([^/]+)/resource/([^/]+)/stats/$"), "get_all_statistics"),
+        ]
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def _send(self, status, body="", content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.state.count_sent(len(body), error=status >= 400)
+
+    def _send_json(self, status, obj):
+        self._send(status, json.dumps(obj))
+
+    def _dispatch(self, method):
+        length = int(self.headers.getheader("Content-Length") or 0)
+        body = self.rfile.read(length) if length else ""
+        path = urlparse.urlparse(self.path).path
+        if path == "/_mock/counters":
+            self._send_json(200, self.server.state.counters())
+            return
+        if path == "/_mock/reset":
+            self.server.state.reset_counters()
+            self._send_json(200, {})
+            return
+        for route_method, pattern, call_type in self._routes:
+            match = pattern.match(path)
+            if route_method == method and match:
+                self.server.state.count(call_type, len(body))
+                if self.server.latency:
+                    time.sleep(random.uniform(0.5, 1.5) * self.server.latency)
+                if self.server.error_rate and random.random() < self.server.error_rate:
+                    self._send_json(503, {"error": "mock: service unavailable"})
+                    return
+                getattr(self, "_" + call_type)(body, *match.groups())
+                return
+        self._send_json(404, {"error": "mock: no route for %s %s" % (method, path)})
+
+    def _project_exists(self, body, project_slug):
+        if self.server.state.project(project_slug) is None:
+            self._send_json(404, {})
+        else:
+            self._send_json(200, {"slug": project_slug, "name": project_slug})
+
+    def _list_resources(self, body, project_slug):
+        project = self.server.state.project(project_slug)
+        if project is None:
+            self._send_json(404, {})
+            return
+        self._send_json(200, [{"slug": r["slug"], "name": r["name"], "i18n_type": r["i18n_type"],
+                               "source_language_code": self.server.state.SOURCE_LANG} for r in project.values()])
+
+    def _new_resource(self, body, project_slug):
+        data = json.loads(body)
+        self.server.state.put_resource(project_slug, data["slug"], data["name"], data.get("i18n_type", "PO"), data["content"])
+        self._send_json(201, ["1"])
+
+    def _update_source_translation(self, body, project_slug, resource_slug):
+        resource = self.server.state.get_resource(project_slug, resource_slug)
+        if resource is None:
+            self._send_json(404, {})
+            return
+        data = json.loads(body)
+        self.server.state.put_resource(project_slug, resource_slug, resource["name"], resource["i18n_type"], data["content"])
+        self._send_json(200, {"strings_added": 0, "strings_updated": 1, "strings_delete": 0})
+
+    def _get_translation(self, body, project_slug, resource_slug, lang):
+        resource = self.server.state.get_resource(project_slug, resource_slug)
+        if resource is None:
+            self._send_json(404, {})
+            return
+        self._send(200, self.server.state.translation(resource, lang), content_type="text/plain; charset=utf-8")
+
+    def _get_statistics(self, body, project_slug, resource_slug, lang):
+        resource = self.server.state.get_resource(project_slug, resource_slug)
+        if resource is None:
+            self._send_json(404, {})
+            return
+        self._send_json(200, self.server.state.stats(resource, lang))
+
+    def _get_all_statistics(self, body, project_slug, resource_slug):
+        resource = self.server.state.get_resource(project_slug, resource_slug)
+        if resource is None:
+            self._send_json(404, {})
+            return
+        self._send_json(200, self.server.state.all_stats(resource))
+
+
+class MockTransifexServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port, state, latency=0.0, error_rate=0.0, verbose=False):
+        BaseHTTPServer.HTTPServer.__init__(self, ("127.0.0.1", port), MockTransifexHandler)
+        self.state = state
+        self.latency = latency
+        self.error_rate = error_rate
+        self.verbose = verbose
+
+    @property
+    def url(self):
+        return "http://%s:%d" % self.server_address
+
+    def start(self):
+        """ Serve from a background thread (for in-process use by the benchmark) """
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+
+def args_get():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-p', '--port', type=int, default=8099, help=r'Port to listen on (localhost only)')
+    parser.add_argument('-l', '--latency', type=float, default=0.0, help=r'Mean per-request latency in seconds, ex: 0.05')
+    parser.add_argument('-e', '--errorrate', type=float, default=0.0, help=r'Fraction of API requests answered with a 503, ex: 0.01')
+    parser.add_argument('-ps', '--payloadsize', type=int, default=4096, help=r'Size in bytes of each translation download')
+    parser.add_argument('-la', '--langs', default="de_DE,es_ES,ko_KR,zh_CN,zh_TW", help=r'Comma separated languages reported by bulk statistics')
+    parser.add_argument('-pr', '--project', action='append', help=r'Known project slug (repeatable), default: any project exists')
+    parser.add_argument('-v', '--verbose', help=r'Log each request', action='store_true')
+    return parser.parse_args()
+
+
+def main():
+    args = args_get()
+    state = MockTransifexState(args.project, args.langs.split(","), args.payloadsize)
+    server = MockTransifexServer(args.port, state, args.latency, args.errorrate, args.verbose)
+    print "Mock Transifex listening on %s" % server.url
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,17 +9,57 @@ Onshape forked version of python-transifex (https://github.com/onshape/python-tr
 """
 
 import argparse
+import BaseHTTPServer
+import codecs
+import collections
+import contextlib
+import csv
 import errno
 import fnmatch
+import functools
 import hashlib
+import HTMLParser
 import json
+import multiprocessing
 import os
+import Queue
 import re
+import signal
+import sqlite3
+import subprocess
 import sys
+import tempfile
+import threading
+import time
+from xml.etree import ElementTree
 
+import requests
+from requests.adapters import HTTPAdapter
 from transifex.api import TransifexAPI
+from transifex.exceptions import TransifexAPIException
 from transifex.util import slugify
 
+try:
+    from hashlib import blake2b
+except ImportError:
+    try:
+        from pyblake2 import blake2b
+    except ImportError:
+        blake2b = None
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
 class TransUpdateError(Exception):
     pass
 
@@ -28,10 +68,49 @@ class _Const(object):
     MODE_UP = 'up'
     MODE_DOWN = 'down'
     MODE_CKSUMFILE = 'cksumfile'
+    MODE_DAEMON = 'daemon'
+    MODE_MERGE = 'merge'
+    MODE_CKSUMIMPORT = 'cksumimport'
+    MODE_CKSUMEXPORT = 'cksumexport'
+    DAEMON_DEBOUNCE_SECS = 5.0
+    DAEMON_POLL_INTERVAL_SECS = 2.0
+    DAEMON_TRIGGER_PORT = 8765
     TRANSIFEX_PROJ_PREFIX = 'onshape-'
     EXIT_OK = 0
     EXIT_ERROR = 1
     EXIT_OK_NOCHANGES = 100
+    DEFAULT_JOBS = 1
+    TRANSIFEX_URL = 'https://www.transifex.com'
+    HTTP_TIMEOUT_SECS = (10.0, 120.0)  # (connect, read between bytes)
+    DOWNLOAD_CHUNK_SIZE = 65536
+    STATS_SNAPSHOT_SUFFIX = 'stats'
+    STATS_SNAPSHOT_PENDING_SUFFIX = 'stats_pending'
+    # the entity totals and the source's last update catch source changes that leave a language's completion as it was
+    STATS_SNAPSHOT_KEYS = ('last_update', 'completed', 'translated_entities', 'untranslated_entities', 'source_last_update')
+    STATS_SOURCE_LAST_UPDATE = 'source_last_update'
+    TRANSIFEX_SOURCE_LANG = 'en'
+    UPLOAD_JOURNAL_SUFFIX = 'english_journal'
+    GIT_STATE_SUFFIX = 'english_git'
+    GIT_PATHS_PER_CALL = 500
+    SHARD_SUFFIX = 'shard_%s_%dof%d'
+    SHARD_FORMAT_VERSION = 1
+    LANGUAGE_ROLLUP_SUFFIX = 'languages'
+    REPORT_FORMAT_JSONL = 'jsonl'
+    REPORT_FORMAT_CSV = 'csv'
+    HASH_ALGORITHM_DEFAULT = 'md5'
+    HASH_ALGORITHM_ENTITY = 'entity'
+    CKSUM_FORMAT_VERSION = 2
+    CKSUM_SUFFIXES = ('', 'english')
+    CKSUM_STORE_JSON = 'json'
+    CKSUM_STORE_SQLITE = 'sqlite'
+    CKSUM_STORE_FILENAME = 'cksum.sqlite3'
+    CKSUM_STORE_TIMEOUT_SECS = 60.0
+    HASH_CACHE_FILENAME = '.hashcache_%s.json'
+    HASH_CACHE_VERSION = 1
+    PARALLEL_HASH_MIN_FILES = 32
+    RETRY_MAX_ATTEMPTS = 5
+    RETRY_BACKOFF_SECS = 1.0
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
     def __setattr__(self, attr, value):
         if hasattr(self, attr):
             raise ValueError, 'Attribute %s already has a value and so cannot be written to' % attr
@@ -46,9 +125,1065 @@ def create_path(path):
         else:
             raise ValueError, 'ERROR: creating folder %s' % path
 
+# re-entrant: print_line holds it while writing through a PrefixedOutput, which takes it too
+_print_lock = threading.RLock()
+
+class PrefixedOutput(object):
+    """ Output stream that passes each complete line on to stream as it's written, prefixed with '[prefix] ' """
+
+    def __init__(self, stream, prefix):
+        self._stream = stream
+        self._prefix = "[%s] " % prefix
+        self._partial = ""
+        self._lock = threading.Lock()
+
+    def write(self, s):
+        with self._lock:
+            lines = (self._partial + s).split("\n")
+            self._partial = lines.pop()
+        if lines:
+            with _print_lock:
+                self._stream.write("".join(self._prefix + line + "\n" for line in lines))
+                self._stream.flush()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        """ Pass on any unterminated last line """
+        if self._partial:
+            self.write("\n")
+
+class ThreadOutput(object):
+    """
+    sys.stdout wrapper that can redirect a thread's output (including print statements) to its own stream.
+    WorkerPool threads inherit the stream of the thread that runs the pool.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+
+    def get_output(self):
+        return getattr(self._local, 'output', None)
+
+    def set_output(self, output):
+        self._local.output = output
+
+    def write(self, s):
+        (self.get_output() or self._stream).write(s)
+
+    def flush(self):
+        (self.get_output() or self._stream).flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+def get_thread_output():
+    return sys.stdout.get_output() if isinstance(sys.stdout, ThreadOutput) else None
+
+def set_thread_output(output):
+    if isinstance(sys.stdout, ThreadOutput):
+        sys.stdout.set_output(output)
+
+def print_line(msg):
+    """ Thread-safe print (worker threads share stdout) """
+    with _print_lock:
+        sys.stdout.write("%s\n" % msg)
+        sys.stdout.flush()
+
+def _get_umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+_UMASK = _get_umask()
+
+def create_temp_file(filename):
+    """ Create an empty temp file alongside filename (same filesystem, so it can be renamed into place) """
+    folder, basename = os.path.split(filename)
+    fd, temp_filename = tempfile.mkstemp(dir=folder, prefix=".%s." % basename, suffix=".part")
+    os.close(fd)
+    return temp_filename
+
+def remove_stale_temp_files(filenames):
+    """ Remove the temp files of filenames left behind by a killed run (they'd otherwise get committed with the clone) """
+    basenames_by_folder = collections.defaultdict(set)
+    for filename in filenames:
+        folder, basename = os.path.split(filename)
+        basenames_by_folder[folder].add(basename)
+    for folder, basenames in basenames_by_folder.iteritems():
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            continue
+        for name in names:
+            if name.startswith(".") and name.endswith(".part") and name[1:-len(".part")].rpartition(".")[0] in basenames:
+                print_line("Removing stale temp file %s" % os.path.join(folder, name))
+                remove_temp_file(os.path.join(folder, name))
+
+def commit_temp_file(temp_filename, filename):
+    """ Atomically replace filename with temp_filename (mkstemp creates 0600 files so restore the usual mode) """
+    os.chmod(temp_filename, 0666 & ~_UMASK)
+    os.rename(temp_filename, filename)
+
+def remove_temp_file(temp_filename):
+    try:
+        os.remove(temp_filename)
+    except OSError:
+        pass
+
+def write_file_atomically(filename, content):
+    """ Replace filename with content, so readers (and a run after a crash) never see a partly written file """
+    temp_filename = create_temp_file(os.path.abspath(filename))
+    try:
+        with open(temp_filename, "w") as fp:
+            fp.write(content)
+        commit_temp_file(temp_filename, filename)
+    finally:
+        remove_temp_file(temp_filename)
+
+HASH_FUNCTIONS = {'md5': hashlib.md5}
+if blake2b is not None:
+    HASH_FUNCTIONS['blake2b'] = blake2b
+
+def _decode_resource(data):
+    """ Resource files are UTF-8 or (iOS .strings) often UTF-16, as flagged by a BOM """
+    if data.startswith(codecs.BOM_UTF16_LE) or data.startswith(codecs.BOM_UTF16_BE):
+        return data.decode("utf-16")
+    if data.startswith(codecs.BOM_UTF8):
+        data = data[len(codecs.BOM_UTF8):]
+    return data.decode("utf-8", "replace")
+
+def _normalize_space(text):
+    return u" ".join(text.split())
+
+_PO_STRING = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
+def _parse_po_entities(text):
+    """ (msgctxt, msgid) -> (msgid_plural, msgstr[n]...) for each message, skipping the header, comments and obsolete entries """
+    entities = []
+    entry = {}
+    keyword = None
+    for line in text.splitlines() + [u""]:
+        line = line.strip()
+        if not line.startswith('"') and 'msgstr' in " ".join(entry) and (not line or line[0] == "#" or line.startswith("msg")
+                                                                         and not line.startswith("msgstr")):
+            # end of an entry
+            if entry.get('msgid'):
+                key = [entry.get('msgctxt', u""), entry['msgid']]
+                value = [entry.get('msgid_plural', u""), 'fuzzy' in entry] + [entry[k] for k in sorted(entry) if k.startswith('msgstr')]
+                entities.append([key, value])
+            entry = {}
+            keyword = None
+        if line.startswith("#"):
+            if line.startswith("#,") and "fuzzy" in line:
+                entry['fuzzy'] = True
+        elif line.startswith('"'):
+            if keyword:
+                entry[keyword] += u"".join(_PO_STRING.findall(line))
+        elif line:
+            keyword, __, rest = line.partition(" ")
+            entry[keyword] = u"".join(_PO_STRING.findall(rest))
+    return entities
+
+_PROPERTIES_ESCAPES = {u"t": u"\t", u"n": u"\n", u"r": u"\r", u"f": u"\f"}
+
+def _unescape_properties(text):
+    chars = []
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c == u"\\" and i + 1 < len(text):
+            i += 1
+            c = text[i]
+            if c == u"u" and re.match(r"[0-9a-fA-F]{4}$", text[i+1:i+5]):
+                chars.append(unichr(int(text[i+1:i+5], 16)))
+                i += 4
+            else:
+                chars.append(_PROPERTIES_ESCAPES.get(c, c))
+        else:
+            chars.append(c)
+        i += 1
+    return u"".join(chars)
+
+def _parse_properties_entities(text):
+    """ key -> value, with line continuations and escapes resolved and comments dropped """
+    entities = []
+    logical_line = u""
+    for line in text.splitlines():
+        line = line.lstrip()
+        if not logical_line and (not line or line[0] in u"#!"):
+            continue
+        trailing_backslashes = len(line) - len(line.rstrip(u"\\"))
+        if trailing_backslashes % 2:
+            logical_line += line[:-1]
+            continue
+        logical_line += line
+        match = re.match(r"((?:[^\\:=\s]|\\.)*)\s*[:=]?\s*(.*)$", logical_line, re.DOTALL)
+        entities.append([_unescape_properties(match.group(1)), _unescape_properties(match.group(2))])
+        logical_line = u""
+    return entities
+
+def _parse_json_entities(text):
+    """ Key path -> string for each leaf; Chrome style {"key": {"message": ..., "description": ...}} uses just the message """
+    entities = []
+
+    def walk(path, node):
+        if isinstance(node, dict):
+            if isinstance(node.get('message'), basestring):
+                entities.append([path, node['message']])
+            else:
+                for key, value in node.iteritems():
+                    walk(path + [key], value)
+        elif isinstance(node, list):
+            for i, value in enumerate(node):
+                walk(path + [i], value)
+        else:
+            entities.append([path, node])
+
+    walk([], json.loads(text))
+    return entities
+
+_STRINGS_TOKEN = re.compile(r'"((?:[^"\\]|\\.)*)"|/\*.*?\*/|//[^\n]*|([=;])', re.DOTALL)
+
+def _parse_strings_entities(text):
+    """ "key" = "value"; pairs of an iOS .strings file, comments dropped """
+    entities = []
+    tokens = []
+    for match in _STRINGS_TOKEN.finditer(text):
+        if match.group(1) is not None:
+            tokens.append(('s', match.group(1)))
+        elif match.group(2):
+            tokens.append((match.group(2), None))
+        if [kind for kind, __ in tokens[-4:]] == ['s', '=', 's', ';']:
+            entities.append([tokens[-4][1], tokens[-2][1]])
+            tokens = []
+    return entities
+
+class _HTMLEntityParser(HTMLParser.HTMLParser):
+    """
+    Collect the translatable text of an HTML resource, in order. Like Transifex, text is segmented by block element
+    with any inline markup (links, bold...) kept in the segment; title/alt/placeholder attributes are segments too.
+    """
+    TRANSLATABLE_ATTRS = ('title', 'alt', 'placeholder')
+    SKIPPED_TAGS = ('script', 'style')
+    INLINE_TAGS = ('a', 'abbr', 'b', 'bdi', 'bdo', 'big', 'br', 'cite', 'code', 'dfn', 'em', 'font', 'i', 'img', 'kbd', 'label',
+                   'mark', 'q', 's', 'samp', 'small', 'span', 'strike', 'strong', 'sub', 'sup', 'time', 'tt', 'u', 'var', 'wbr')
+
+    def __init__(self):
+        HTMLParser.HTMLParser.__init__(self)
+        self.entities = []
+        self._skip = 0
+        self._segment = []
+        self._segment_has_text = False
+
+    def _add_entity(self, value):
+        self.entities.append([len(self.entities), _normalize_space(value)])
+
+    def _end_segment(self):
+        if self._segment_has_text:
+            self._add_entity(u"".join(self._segment))
+        self._segment = []
+        self._segment_has_text = False
+
+    def _handle_tag(self, tag, attrs):
+        if tag in self.INLINE_TAGS:
+            self._segment.append(self.get_starttag_text())
+        else:
+            self._end_segment()
+        for name, value in attrs:
+            if name in self.TRANSLATABLE_ATTRS and value and value.strip():
+                self._add_entity(value)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self._end_segment()
+            self._skip += 1
+        elif not self._skip:
+            self._handle_tag(tag, attrs)
+
+    def handle_startendtag(self, tag, attrs):
+        if not self._skip:
+            self._handle_tag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS:
+            if self._skip:
+                self._skip -= 1
+        elif not self._skip:
+            if tag in self.INLINE_TAGS:
+                self._segment.append(u"</%s>" % tag)
+            else:
+                self._end_segment()
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._segment.append(data)
+            self._segment_has_text = self._segment_has_text or bool(data.strip())
+
+    def handle_entityref(self, name):
+        self.handle_data(self.unescape("&%s;" % name))
+
+    def handle_charref(self, name):
+        self.handle_data(self.unescape("&#%s;" % name))
+
+    def close(self):
+        HTMLParser.HTMLParser.close(self)
+        self._end_segment()
+
+def _parse_html_entities(text):
+    """ Text segments are keyed by position since HTML has no keys (so moving text around is a change) """
+    parser = _HTMLEntityParser()
+    parser.feed(text)
+    parser.close()
+    return parser.entities
+
+def _xml_text(element):
+    """ The inner content of an element, markup included, with whitespace collapsed """
+    inner = (element.text or "") + "".join(ElementTree.tostring(child, encoding="utf-8").decode("utf-8") for child in element)
+    return _normalize_space(inner)
+
+def _parse_android_entities(text):
+    """ name -> text of the string, string-array and plurals resources (translatable="false" ones are skipped) """
+    entities = []
+    root = ElementTree.fromstring(text.encode("utf-8"))
+    for element in root:
+        name = element.get('name')
+        if name is None or element.get('translatable') == 'false':
+            continue
+        if element.tag == 'string':
+            entities.append([[name], _xml_text(element)])
+        elif element.tag in ('string-array', 'plurals'):
+            for i, item in enumerate(element.findall('item')):
+                entities.append([[name, item.get('quantity', i)], _xml_text(item)])
+    return entities
+
+def _parse_qt_entities(text):
+    """ (context, source, comment) -> translation(s) of each Qt Linguist message """
+    entities = []
+    root = ElementTree.fromstring(text.encode("utf-8"))
+    for context in root.iter('context'):
+        context_name = context.findtext('name', "")
+        for message in context.iter('message'):
+            key = [context_name, message.findtext('source', ""), message.findtext('comment', "")]
+            translation = message.find('translation')
+            value = []
+            if translation is not None:
+                numerus_forms = translation.findall('numerusform')
+                value = [form.text or "" for form in numerus_forms] if numerus_forms else [translation.text or ""]
+                value.append(translation.get('type', ""))
+            entities.append([key, value])
+    return entities
+
+ENTITY_PARSERS = {
+    "po": _parse_po_entities,
+    "properties": _parse_properties_entities,
+    "json": _parse_json_entities,
+    "strings": _parse_strings_entities,
+    "html": _parse_html_entities,
+    "xml": _parse_android_entities,
+    "ts": _parse_qt_entities
+    }
+
+def compute_entity_fingerprint(filename):
+    """
+    Digest of a resource file's entities (key -> source/translated string) rather than its bytes, so reordering,
+    comment, whitespace and PO header edits don't count as changes. Files that can't be parsed fall back to a
+    (differently prefixed) byte digest.
+    """
+    with open(filename, "rb") as fp:
+        data = fp.read()
+    parser = ENTITY_PARSERS.get(os.path.splitext(filename)[1][1:])
+    if parser:
+        try:
+            entities = sorted(parser(_decode_resource(data)))
+            serialized = json.dumps(entities, ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+            return "e:" + hashlib.md5(serialized).hexdigest()
+        except (ValueError, TypeError, ElementTree.ParseError, HTMLParser.HTMLParseError):
+            pass
+    return "b:" + hashlib.md5(data).hexdigest()
+
+# byte digests plus the format aware entity fingerprint, which can't be computed incrementally from a stream
+HASH_ALGORITHMS = sorted(HASH_FUNCTIONS) + [_Const.HASH_ALGORITHM_ENTITY]
+
+def compute_file_hash(filename, algorithm=_Const.HASH_ALGORITHM_DEFAULT, nBufferSize=8192):
+    if not os.path.exists(filename):
+        raise TransUpdateError("ERROR: file does not exist: '%s'" % filename)
+    if algorithm == _Const.HASH_ALGORITHM_ENTITY:
+        return compute_entity_fingerprint(filename)
+    with open(filename, "rb") as fp:
+        m = HASH_FUNCTIONS[algorithm]()
+        s = fp.read(nBufferSize)
+        while s:
+            m.update(s)
+            s = fp.read(nBufferSize)
+    return m.hexdigest()
+
+def _compute_file_hash_worker(args):
+    """ multiprocessing.Pool entry point (must be a module level function) """
+    return compute_file_hash(*args)
+
+class Metrics(object):
+    """
+    Run instrumentation: wall/CPU time per phase, a latency histogram per Transifex API call type, bytes transferred
+    and retries, all per project (the project a thread is working on, see set_project, which WorkerPool threads inherit).
+    Phases may nest or overlap (e.g. concurrent projects), CPU time is process wide.
+    """
+    LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._start_wall = time.time()
+        self._start_cpu = self._cpu_time()
+        self.projects = collections.OrderedDict()
+
+    def get_project(self):
+        return getattr(self._local, 'project', "")
+
+    def set_project(self, project):
+        """ Record the calling thread's metrics under project """
+        self._local.project = project
+
+    def _project_metrics(self):
+        """ The current project's metrics (call with self._lock held) """
+        return self.projects.setdefault(self.get_project(), {'phases': collections.OrderedDict(), 'calls': collections.OrderedDict(),
+                                                             'retries': {}, 'bytes_sent': 0, 'bytes_received': 0})
+
+    @staticmethod
+    def _cpu_time():
+        times = os.times()
+        return times[0] + times[1]
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start_wall = time.time()
+        start_cpu = self._cpu_time()
+        try:
+            yield
+        finally:
+            wall_secs = time.time() - start_wall
+            cpu_secs = self._cpu_time() - start_cpu
+            with self._lock:
+                phase = self._project_metrics()['phases'].setdefault(name, {'count': 0, 'wall_secs': 0.0, 'cpu_secs': 0.0})
+                phase['count'] += 1
+                phase['wall_secs'] += wall_secs
+                phase['cpu_secs'] += cpu_secs
+
+    def observe_call(self, call_type, secs, error=False):
+        with self._lock:
+            call = self._project_metrics()['calls'].setdefault(call_type, {'count': 0, 'errors': 0, 'sum_secs': 0.0,
+                                                     'buckets': [0] * len(self.LATENCY_BUCKETS)})
+            call['count'] += 1
+            call['sum_secs'] += secs
+            if error:
+                call['errors'] += 1
+            for i, upper_bound in enumerate(self.LATENCY_BUCKETS):
+                if secs <= upper_bound:
+                    call['buckets'][i] += 1
+
+    def add_bytes(self, sent=0, received=0):
+        with self._lock:
+            project_metrics = self._project_metrics()
+            project_metrics['bytes_sent'] += sent
+            project_metrics['bytes_received'] += received
+
+    def add_retry(self, call_type):
+        with self._lock:
+            retries = self._project_metrics()['retries']
+            retries[call_type] = retries.get(call_type, 0) + 1
+
+    def to_dict(self, labels, exit_val):
+        with self._lock:
+            return {
+                'labels': labels,
+                'exit_code': exit_val,
+                'timestamp': time.time(),
+                'wall_secs': time.time() - self._start_wall,
+                'cpu_secs': self._cpu_time() - self._start_cpu,
+                'latency_buckets': self.LATENCY_BUCKETS,
+                'projects': self.projects
+                }
+
+    def _prometheus_text(self, metrics_dict):
+        base_labels = metrics_dict['labels']
+
+        def sample(name, value, **labels):
+            all_labels = dict(base_labels, **labels)
+            label_text = ",".join('%s="%s"' % (key, str(all_labels[key]).replace('"', '\\"')) for key in sorted(all_labels))
+            return "%s{%s} %s" % (name, label_text, repr(float(value)))
+
+        lines = []
+        def add(name, metric_type, help_text, samples):
+            lines.append("# HELP %s %s" % (name, help_text))
+            lines.append("# TYPE %s %s" % (name, metric_type))
+            lines.extend(samples)
+
+        add("transupdate_run_wall_seconds", "gauge", "Wall time of the run", [sample("transupdate_run_wall_seconds", metrics_dict['wall_secs'])])
+        add("transupdate_run_cpu_seconds", "gauge", "CPU time of the run", [sample("transupdate_run_cpu_seconds", metrics_dict['cpu_secs'])])
+        add("transupdate_exit_code", "gauge", "Exit code of the run", [sample("transupdate_exit_code", metrics_dict['exit_code'])])
+        add("transupdate_last_run_timestamp_seconds", "gauge", "Time the run finished",
+            [sample("transupdate_last_run_timestamp_seconds", metrics_dict['timestamp'])])
+        projects = metrics_dict['projects']
+        add("transupdate_phase_wall_seconds", "gauge", "Wall time per phase",
+            [sample("transupdate_phase_wall_seconds", phase['wall_secs'], project=project, phase=name)
+             for project, project_metrics in projects.iteritems() for name, phase in project_metrics['phases'].iteritems()])
+        add("transupdate_phase_cpu_seconds", "gauge", "CPU time per phase",
+            [sample("transupdate_phase_cpu_seconds", phase['cpu_secs'], project=project, phase=name)
+             for project, project_metrics in projects.iteritems() for name, phase in project_metrics['phases'].iteritems()])
+        histogram = []
+        for project, project_metrics in projects.iteritems():
+            for call_type, call in project_metrics['calls'].iteritems():
+                for upper_bound, count in zip(self.LATENCY_BUCKETS, call['buckets']):
+                    histogram.append(sample("transupdate_api_request_duration_seconds_bucket", count, project=project, call=call_type,
+                                            le=repr(upper_bound)))
+                histogram.append(sample("transupdate_api_request_duration_seconds_bucket", call['count'], project=project, call=call_type, le="+Inf"))
+                histogram.append(sample("transupdate_api_request_duration_seconds_sum", call['sum_secs'], project=project, call=call_type))
+                histogram.append(sample("transupdate_api_request_duration_seconds_count", call['count'], project=project, call=call_type))
+        add("transupdate_api_request_duration_seconds", "histogram", "Transifex API request latency per call type", histogram)
+        add("transupdate_api_request_errors", "gauge", "Failed Transifex API requests per call type",
+            [sample("transupdate_api_request_errors", call['errors'], project=project, call=call_type)
+             for project, project_metrics in projects.iteritems() for call_type, call in project_metrics['calls'].iteritems()])
+        add("transupdate_api_retries", "gauge", "Transifex API retries per call type",
+            [sample("transupdate_api_retries", count, project=project, call=call_type)
+             for project, project_metrics in projects.iteritems() for call_type, count in sorted(project_metrics['retries'].iteritems())])
+        add("transupdate_bytes_sent", "gauge", "Bytes sent to Transifex",
+            [sample("transupdate_bytes_sent", project_metrics['bytes_sent'], project=project) for project, project_metrics in projects.iteritems()])
+        add("transupdate_bytes_received", "gauge", "Bytes received from Transifex",
+            [sample("transupdate_bytes_received", project_metrics['bytes_received'], project=project)
+             for project, project_metrics in projects.iteritems()])
+        return "\n".join(lines) + "\n"
+
+    def write(self, metrics_file, labels, exit_val):
+        """ Write metrics_file (JSON) and, alongside it, a .prom file for the Prometheus node exporter textfile collector """
+        metrics_dict = self.to_dict(labels, exit_val)
+        prom_file = os.path.splitext(metrics_file)[0] + ".prom"
+        for filename, content in ((metrics_file, json.dumps(metrics_dict, indent=2, sort_keys=True)),
+                                  (prom_file, self._prometheus_text(metrics_dict))):
+            # the textfile collector may read at any time, so replace atomically
+            write_file_atomically(filename, content)
+
+metrics = Metrics()
+
+def timed_phase(name):
+    """ Decorator: record each call's wall/CPU time under phase name """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with metrics.phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def timed_api_call(func):
+    """ Decorator: record each call's latency (and failure) under the function name """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.time()
+        error = True
+        try:
+            result = func(*args, **kwargs)
+            error = False
+            return result
+        finally:
+            metrics.observe_call(func.__name__, time.time() - start, error)
+    return wrapper
+
+def _is_retryable(exc):
+    if isinstance(exc, TransifexAPIException):
+        return exc.response is not None and exc.response.status_code in _Const.RETRY_STATUS_CODES
+    # ChunkedEncodingError: the connection dropped part way through a streamed download
+    return isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError))
+
+def call_with_retry(func, *args, **kwargs):
+    """ Call a Transifex API function, retrying with exponential backoff on throttling, server and connection errors """
+    delay = _Const.RETRY_BACKOFF_SECS
+    attempt = 1
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except (TransifexAPIException, requests.exceptions.RequestException) as e:
+            if attempt >= _Const.RETRY_MAX_ATTEMPTS or not _is_retryable(e):
+                raise
+            print_line("Retrying (%d/%d) in %.1fs after error: %s" % (attempt, _Const.RETRY_MAX_ATTEMPTS - 1, delay, e))
+            metrics.add_retry(getattr(func, '__name__', 'unknown'))
+            time.sleep(delay)
+            delay *= 2
+            attempt += 1
+
+# set on KeyboardInterrupt: shared by every WorkerPool, as only the main thread sees the interrupt but pools are nested
+# (each project of a multi-project run has its own download/upload pools)
+_interrupted = threading.Event()
+
+class WorkerPool(object):
+    """
+    Bounded pool of worker threads.
+    The first failure sets the abort flag: queued items are dropped, in-flight items are allowed to finish (so they
+    can clean up after themselves) and the failure is re-raised in the calling thread.
+    A KeyboardInterrupt does the same in every pool, and each one raises KeyboardInterrupt in its calling thread.
+    """
+
+    def __init__(self, num_workers):
+        self._num_workers = max(1, num_workers)
+        self.abort = threading.Event()
+
+    def map(self, func, items, stop_on_error=True):
+        """
+        Return [func(item) for item in items], in item order.
+        With stop_on_error=False every item is attempted and a failed item's result is its exception.
+        """
+        if _interrupted.is_set():
+            raise KeyboardInterrupt
+        items = list(items)
+        results = [None] * len(items)
+        errors = []
+        work = Queue.Queue()
+        for i, item in enumerate(items):
+            work.put((i, item))
+        thread_output = get_thread_output()
+        project = metrics.get_project()
+
+        def worker():
+            set_thread_output(thread_output)
+            metrics.set_project(project)
+            while not self.abort.is_set() and not _interrupted.is_set():
+                try:
+                    i, item = work.get_nowait()
+                except Queue.Empty:
+                    return
+                try:
+                    results[i] = func(item)
+                except KeyboardInterrupt:
+                    # raised by a nested pool: this pool's calling thread re-raises it
+                    _interrupted.set()
+                except Exception as e:
+                    if stop_on_error:
+                        errors.append(sys.exc_info())
+                        self.abort.set()
+                    else:
+                        results[i] = e
+
+        if self._num_workers == 1:
+            worker()
+        else:
+            threads = [threading.Thread(target=worker) for __ in range(min(self._num_workers, len(items)))]
+            for thread in threads:
+                thread.daemon = True
+                thread.start()
+            try:
+                for thread in threads:
+                    # join with a timeout so the main thread still sees KeyboardInterrupt
+                    while thread.is_alive():
+                        thread.join(0.2)
+            except KeyboardInterrupt:
+                _interrupted.set()
+                for thread in threads:
+                    thread.join()
+                raise
+        if _interrupted.is_set():
+            raise KeyboardInterrupt
+        if errors:
+            exc_type, exc_value, exc_tb = errors[0]
+            raise exc_type, exc_value, exc_tb
+        return results
+
+class UploadJournal(object):
+    """
+    Append-only record (JSON lines) of the source files a run has uploaded, so a retried run can skip them.
+    An entry only counts while the file's digest is unchanged. A torn last line (crash mid-write) is ignored.
+    """
+
+    def __init__(self, journal_filename):
+        self._journal_filename = journal_filename
+        self._entries = {}
+        self._lock = threading.Lock()
+        try:
+            with open(journal_filename, "r") as fp:
+                for line in fp:
+                    try:
+                        entry = json.loads(line)
+                        self._entries[entry['file']] = entry['digest']
+                    except (ValueError, KeyError, TypeError):
+                        pass
+        except IOError:
+            pass
+
+    def is_done(self, filename, digest):
+        return self._entries.get(filename) == digest
+
+    def record(self, filename, digest):
+        with self._lock:
+            with open(self._journal_filename, "a") as fp:
+                fp.write(json.dumps({'file': filename, 'digest': digest}) + "\n")
+                fp.flush()
+                os.fsync(fp.fileno())
+            self._entries[filename] = digest
+
+    def remove(self):
+        with self._lock:
+            remove_temp_file(self._journal_filename)
+            self._entries = {}
+
+class FileHashCache(object):
+    """
+    Persistent cache of file digests keyed by path and validated by (size, mtime_ns, inode), so unchanged files
+    are never re-read. Like git's index, an entry whose mtime isn't older than the cache file's is "racy" (a later
+    same-size write in the same timestamp tick would leave the stat info unchanged), so it's re-hashed once on load.
+    """
+
+    def __init__(self, cache_filename):
+        self._cache_filename = cache_filename
+        self._entries = {}
+        self._racy = set()
+        self._dirty = False
+        self._lock = threading.Lock()
+        try:
+            with open(cache_filename, "r") as fp:
+                cache = json.load(fp)
+                cache_mtime_ns = self.stat_key(os.fstat(fp.fileno()))[1]
+            if cache.get('version') == _Const.HASH_CACHE_VERSION:
+                self._entries = cache['entries']
+                self._racy = set(filename for filename, entry in self._entries.iteritems() if entry['stat'][1] >= cache_mtime_ns)
+        except (IOError, ValueError, KeyError, AttributeError, TypeError, IndexError):
+            self._entries = {}
+            self._racy = set()
+
+    @staticmethod
+    def stat_key(st):
+        mtime_ns = getattr(st, 'st_mtime_ns', None)
+        if mtime_ns is None:
+            mtime_ns = int(st.st_mtime * 1000000000)
+        return [st.st_size, mtime_ns, st.st_ino]
+
+    def get(self, filename, st, algorithm):
+        with self._lock:
+            entry = self._entries.get(filename)
+            racy = filename in self._racy
+        if entry and not racy and entry['stat'] == self.stat_key(st):
+            return entry['digests'].get(algorithm)
+        return None
+
+    def put(self, filename, st, algorithm, digest):
+        key = self.stat_key(st)
+        with self._lock:
+            entry = self._entries.get(filename)
+            if not entry or entry['stat'] != key or filename in self._racy:
+                entry = self._entries[filename] = {'stat': key, 'digests': {}}
+                self._racy.discard(filename)
+            entry['digests'][algorithm] = digest
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            write_file_atomically(self._cache_filename, json.dumps({'version': _Const.HASH_CACHE_VERSION, 'entries': self._entries}))
+            self._dirty = False
+
+class ChecksumStore(object):
+    """
+    SQLite store of the checksum sets otherwise kept as <branch>_<repo>[_suffix].json files.
+    Writes are single transactions (BEGIN IMMEDIATE, waiting up to CKSUM_STORE_TIMEOUT_SECS for other writers) and
+    partial updates only touch their own rows, so jobs sharing a cksum folder can't clobber each other.
+    A branch without checksums of its own reads those of its parent branch, copy on write: the parent's checksums
+    are copied to the branch (in the same transaction) when it first updates them.
+    """
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS cksum_set (branch TEXT NOT NULL, name TEXT NOT NULL, suffix TEXT NOT NULL, algorithm TEXT NOT NULL, "
+        "seeded_from TEXT, updated REAL NOT NULL, PRIMARY KEY (branch, name, suffix))",
+        "CREATE TABLE IF NOT EXISTS cksum (branch TEXT NOT NULL, name TEXT NOT NULL, suffix TEXT NOT NULL, filename TEXT NOT NULL, "
+        "digest TEXT NOT NULL, PRIMARY KEY (branch, name, suffix, filename))"
+        )
+
+    def __init__(self, store_filename):
+        self._store_filename = store_filename
+        with self._connect() as db:
+            # readers don't block the writer (persistent, so set just once per database)
+            db.execute("PRAGMA journal_mode=WAL")
+        with self._transaction() as db:
+            for statement in self.SCHEMA:
+                db.execute(statement)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self._store_filename, timeout=_Const.CKSUM_STORE_TIMEOUT_SECS, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def _get_algorithm(self, db, branch, name, suffix):
+        row = db.execute("SELECT algorithm FROM cksum_set WHERE branch = ? AND name = ? AND suffix = ?", (branch, name, suffix)).fetchone()
+        return row[0] if row else None
+
+    def _read(self, db, branch, name, suffix, parent_branch):
+        for branch in (branch, parent_branch):
+            algorithm = self._get_algorithm(db, branch, name, suffix) if branch else None
+            if algorithm is not None:
+                return branch, algorithm, dict(db.execute("SELECT filename, digest FROM cksum WHERE branch = ? AND name = ? AND suffix = ?",
+                                                          (branch, name, suffix)).fetchall())
+        return None, None, None
+
+    def _insert_set(self, db, branch, name, suffix, algorithm, seeded_from=None):
+        db.execute("INSERT OR REPLACE INTO cksum_set VALUES (?, ?, ?, ?, ?, ?)", (branch, name, suffix, algorithm, seeded_from, time.time()))
+
+    def _insert(self, db, branch, name, suffix, hashinfo):
+        db.executemany("INSERT OR REPLACE INTO cksum VALUES (?, ?, ?, ?, ?)",
+                       ((branch, name, suffix, filename, digest) for filename, digest in hashinfo.iteritems()))
+
+    def exists(self, branch, name, suffix):
+        with self._connect() as db:
+            return self._get_algorithm(db, branch, name, suffix) is not None
+
+    def read(self, branch, name, suffix, parent_branch=None):
+        """ (algorithm, hashinfo) of the branch, else of parent_branch, else None """
+        with self._connect() as db:
+            __, algorithm, hashinfo = self._read(db, branch, name, suffix, parent_branch)
+        return (algorithm, hashinfo) if algorithm is not None else None
+
+    def write(self, branch, name, suffix, algorithm, hashinfo):
+        """ Replace the branch's checksums """
+        with self._transaction() as db:
+            db.execute("DELETE FROM cksum WHERE branch = ? AND name = ? AND suffix = ?", (branch, name, suffix))
+            self._insert_set(db, branch, name, suffix, algorithm)
+            self._insert(db, branch, name, suffix, hashinfo)
+
+    def update(self, branch, name, suffix, algorithm, hashinfo, parent_branch=None):
+        """ Add or replace just the given entries (digests computed with algorithm), first copying the parent's if needed """
+        with self._transaction() as db:
+            read_branch, read_algorithm, read_hashinfo = self._read(db, branch, name, suffix, parent_branch)
+            if read_branch == branch and read_algorithm != algorithm:
+                raise TransUpdateError("ERROR: checksums of %s_%s%s were rewritten using '%s' by another run" %
+                                       (branch, name, "_" + suffix if suffix else suffix, read_algorithm))
+            if read_branch != branch:
+                seeded_from = None
+                if read_branch is not None and read_algorithm == algorithm:
+                    self._insert(db, branch, name, suffix, read_hashinfo)
+                    seeded_from = read_branch
+                self._insert_set(db, branch, name, suffix, algorithm, seeded_from)
+            else:
+                db.execute("UPDATE cksum_set SET updated = ? WHERE branch = ? AND name = ? AND suffix = ?", (time.time(), branch, name, suffix))
+            self._insert(db, branch, name, suffix, hashinfo)
+
+class ReportWriter(object):
+    """
+    JSON Lines or CSV sink for machine readable report records, shared by concurrently reported projects.
+    Each record is flushed as it's written so the report can be followed while a run is in progress.
+    """
+    FIELDS = ('type', 'project', 'resource', 'lang', 'status', 'changed', 'completed', 'translated_words', 'total_words',
+              'translated_entities', 'total_entities', 'last_commiter', 'last_update', 'resources', 'changed_resources',
+              'completed_delta', 'translated_words_delta')
+
+    def __init__(self, report_filename, report_format):
+        self._lock = threading.Lock()
+        self._fp = open(report_filename, "wb")
+        self._csv = None
+        if report_format == _Const.REPORT_FORMAT_CSV:
+            self._csv = csv.DictWriter(self._fp, self.FIELDS)
+            self._csv.writeheader()
+
+    def write(self, record):
+        with self._lock:
+            if self._csv:
+                self._csv.writerow(dict((key, value.encode("utf-8") if isinstance(value, unicode) else value)
+                                        for key, value in record.iteritems()))
+            else:
+                self._fp.write(json.dumps(record, sort_keys=True) + "\n")
+            self._fp.flush()
+
+    def close(self):
+        with self._lock:
+            self._fp.close()
+
+class ResultsReport(object):
+    """
+    Results of a download run, one resource/lang row at a time: a line of the console table plus (given a ReportWriter)
+    a 'resource' record, with per-language 'language' rollups (and their change since previous_rollups) at the end.
+    Rows can be added from the download threads as each file completes.
+    """
+    LINE_FORMAT = "%-12s%-115s%-16s%-12s%-15s%s"
+    ROLLUP_LINE_FORMAT = "%-12s%-12s%-12s%-20s%-12s%s"
+
+    def __init__(self, project, report_writer=None, previous_rollups=None):
+        self._project = project
+        self._report_writer = report_writer
+        self._previous_rollups = previous_rollups or {}
+        self._lock = threading.Lock()
+        self.rollups = collections.OrderedDict()
+        self.missing_stats = []
+        self.num_changed = 0
+
+    def _write(self, record_type, record):
+        if self._report_writer:
+            record.update({'type': record_type, 'project': self._project})
+            self._report_writer.write(record)
+
+    def start(self):
+        print_line(self.LINE_FORMAT % ("Completed", "Resource", "Words", "Entities", "Commiter", "Updated"))
+
+    def add(self, filename_lang, lang, stats, changed):
+        with self._lock:
+            self._add(filename_lang, lang, stats, changed)
+
+    def _add(self, filename_lang, lang, stats, changed):
+        self.num_changed += 1 if changed else 0
+        if stats is None:
+            print_line(self.LINE_FORMAT % ("!!! n/a", filename_lang, "", "", "", ""))
+            self.missing_stats.append(filename_lang)
+            self._write('resource', {'resource': filename_lang, 'lang': lang, 'status': 'no_stats', 'changed': changed})
+            return
+        translated_words = int(stats['translated_words'])
+        word_total = translated_words + int(stats['untranslated_words'])
+        translated_entities = int(stats['translated_entities'])
+        entity_total = translated_entities + int(stats['untranslated_entities'])
+        completed_item = "*** %s" % stats['completed'] if changed else stats['completed']
+        print_line(self.LINE_FORMAT % (completed_item, filename_lang, "%d/%d" % (translated_words, word_total),
+                                       "%d/%d" % (translated_entities, entity_total), stats['last_commiter'], stats['last_update']))
+        self._write('resource', {'resource': filename_lang, 'lang': lang, 'status': 'ok', 'changed': changed,
+                                 'completed': stats['completed'], 'translated_words': translated_words, 'total_words': word_total,
+                                 'translated_entities': translated_entities, 'total_entities': entity_total,
+                                 'last_commiter': stats['last_commiter'], 'last_update': stats['last_update']})
+        rollup = self.rollups.setdefault(lang, {'resources': 0, 'changed_resources': 0, 'translated_words': 0, 'total_words': 0,
+                                                'translated_entities': 0, 'total_entities': 0})
+        rollup['resources'] += 1
+        rollup['changed_resources'] += 1 if changed else 0
+        rollup['translated_words'] += translated_words
+        rollup['total_words'] += word_total
+        rollup['translated_entities'] += translated_entities
+        rollup['total_entities'] += entity_total
+
+    @staticmethod
+    def _completed(rollup):
+        """ Word based completion percentage """
+        return 100.0 * rollup['translated_words'] / rollup['total_words'] if rollup['total_words'] else 100.0
+
+    def finish(self):
+        """ Show the number of changed/new files and record the per-language rollups """
+        print "\nNumber of changed/new files (***): %d" % self.num_changed
+        print "\n" + self.ROLLUP_LINE_FORMAT % ("Language", "Resources", "Changed", "Words", "Completed", "Change")
+        for lang in sorted(self.rollups):
+            rollup = self.rollups[lang]
+            completed = self._completed(rollup)
+            record = dict(rollup, lang=lang, completed="%.1f%%" % completed)
+            change_item = "new"
+            previous_rollup = self._previous_rollups.get(lang)
+            if previous_rollup:
+                record['completed_delta'] = round(completed - self._completed(previous_rollup), 1)
+                record['translated_words_delta'] = rollup['translated_words'] - previous_rollup['translated_words']
+                change_item = "%+.1f%% (%+d words)" % (record['completed_delta'], record['translated_words_delta'])
+            print self.ROLLUP_LINE_FORMAT % (lang, rollup['resources'], rollup['changed_resources'],
+                                             "%d/%d" % (rollup['translated_words'], rollup['total_words']), record['completed'], change_item)
+            self._write('language', record)
+
 class OnTransifexAPI(TransifexAPI):
-    def __init__(self, transuser, transpass, url):
+    """
+    TransifexAPI with a persistent keep-alive connection pool that is reused by every call (and thread) in a run.
+    The calls used by TransUpdate are overridden here because the base class opens a new connection per request.
+    """
+
+    def __init__(self, transuser, transpass, url, pool_size=_Const.DEFAULT_JOBS):
         TransifexAPI.__init__(self, transuser, transpass, url)
+        self._session = requests.Session()
+        self._session.auth = self._auth
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+    def _request(self, method, path, expected_status=(requests.codes['OK'],), **kwargs):
+        url = '%s/%s' % (self._base_api_url, path)
+        kwargs.setdefault('timeout', _Const.HTTP_TIMEOUT_SECS)
+        response = self._session.request(method, url, **kwargs)
+        # streamed response bodies are counted as they're read
+        metrics.add_bytes(sent=len(kwargs.get('data') or ''), received=0 if kwargs.get('stream') else len(response.content))
+        if response.status_code not in expected_status:
+            if kwargs.get('stream'):
+                # read the (small) error body so the connection goes back to the pool; the exception shows it
+                metrics.add_bytes(received=len(response.content))
+                response.close()
+            raise TransifexAPIException(response)
+        return response
+
+    @timed_api_call
+    def project_exists(self, project_slug):
+        response = self._request('GET', 'project/%s/' % project_slug,
+                                 expected_status=(requests.codes['OK'], requests.codes['NOT_FOUND']))
+        return response.status_code == requests.codes['OK']
+
+    @timed_api_call
+    def list_resources(self, project_slug):
+        return self._request('GET', 'project/%s/resources/' % project_slug).json()
+
+    @timed_api_call
+    def new_resource(self, project_slug, path_to_pofile, resource_slug=None, resource_name=None, i18n_type='PO'):
+        with open(path_to_pofile, 'r') as fp:
+            content = fp.read()
+        if resource_slug is None:
+            resource_slug = slugify(os.path.basename(path_to_pofile))
+        if resource_name is None:
+            resource_name = resource_slug
+        data = {'name': resource_name, 'slug': resource_slug, 'content': content, 'i18n_type': i18n_type}
+        self._request('POST', 'project/%s/resources/' % project_slug, expected_status=(requests.codes['CREATED'],),
+                      data=json.dumps(data), headers={'content-type': 'application/json'})
+
+    @timed_api_call
+    def update_source_translation(self, project_slug, path_to_pofile, i18n_type='PO'):
+        with open(path_to_pofile, 'r') as fp:
+            content = fp.read()
+        resource_slug = slugify(os.path.basename(path_to_pofile))
+        response = self._request('PUT', 'project/%s/resource/%s/content/' % (project_slug, resource_slug),
+                                 data=json.dumps({'content': content, 'i18n_type': i18n_type}),
+                                 headers={'content-type': 'application/json'})
+        return response.json()
+
+    @timed_api_call
+    def get_translation(self, project_slug, resource_slug, language_code, path_to_pofile, hash_algorithms=()):
+        """
+        Stream a translation to a temp file alongside path_to_pofile, hashing it as it arrives, then atomically rename
+        it into place (so a failed or aborted download never leaves a partial file). Returns {algorithm: hex digest}.
+        """
+        response = self._request('GET', 'project/%s/resource/%s/translation/%s/' % (project_slug, resource_slug, language_code),
+                                 params={'file': ''}, stream=True)
+        hashers = dict((algorithm, HASH_FUNCTIONS[algorithm]()) for algorithm in hash_algorithms)
+        temp_file = create_temp_file(path_to_pofile)
+        try:
+            with open(temp_file, 'wb') as fp:
+                for chunk in response.iter_content(_Const.DOWNLOAD_CHUNK_SIZE):
+                    fp.write(chunk)
+                    for hasher in hashers.itervalues():
+                        hasher.update(chunk)
+                    metrics.add_bytes(received=len(chunk))
+            commit_temp_file(temp_file, path_to_pofile)
+        finally:
+            response.close()
+            remove_temp_file(temp_file)
+        return dict((algorithm, hasher.hexdigest()) for algorithm, hasher in hashers.iteritems())
+
+    @timed_api_call
+    def get_statistics(self, project_slug, resource_slug, language_code):
+        return self._request('GET', 'project/%s/resource/%s/stats/%s/' % (project_slug, resource_slug, language_code)).json()
+
+    @timed_api_call
+    def get_all_statistics(self, project_slug, resource_slug):
+        """ Completion stats for every language of a resource in a single request: {lang: stats} """
+        return self._request('GET', 'project/%s/resource/%s/stats/' % (project_slug, resource_slug)).json()
+
+def load_localize_info(src_folder, json_file):
+    """ Return the list of project specs in a repo's localize info file (a single project may be a bare object) """
+    with open(os.path.join(src_folder, json_file), "r") as fp:
+        spec = json.load(fp)
+    return spec if isinstance(spec, list) else [spec]
 
 class ResourceInfo(object):
     """
@@ -56,39 +1191,69 @@ class ResourceInfo(object):
     The 'resources' file spec isn't fully generalized but is sufficient to handle the newton, ios and android repos.
     There are two main forms of file spec:
     1) newton: wildcards allowed, lang expected to be file base name suffix ex: 'project/translations/*.po'
+       (directory wildcards, including '**' for any number of directories, are allowed ex: 'project/**/l10n/*.json')
     2) android, ios: no wildcards, lang specified in path by '%s', ex: 'belcad/belcad/%s.lproj/Localizable.strings'
+    The file list is built once (a single scandir pass per directory) and cached for the rest of the run,
+    call invalidate() if the source tree may have changed.
     """
+    _UNKNOWN, _DIR, _FILE, _OTHER = range(4)
 
-    def __init__(self, src_folder, json_file):
+    def __init__(self, src_folder, json_file, project_index=0):
         self._src_folder = src_folder
-        full_path = os.path.join(src_folder, json_file)
-        with open(full_path, "r") as fp:
-            self._res_spec = json.load(fp)
+        self._res_spec = load_localize_info(src_folder, json_file)[project_index]
+        self.proj_suffix = self._res_spec.get('proj_suffix', "")
         self._lang_exclude = ["pig_latin"]
         for lang in self._res_spec['langs']:
             self._lang_exclude.append(lang.items()[0][0])
+        self._foreign_lang_patterns = {}
+        self._manifest = None
+        self._dir_cache = {}
+        self._subdir_cache = {}
+
+    def invalidate(self):
+        self._manifest = None
+        self._dir_cache = {}
+        self._subdir_cache = {}
 
     def get(self, english_mode=True):
+        if self._manifest is None:
+            self._manifest = self._build_manifest()
+        english_files, file_list, tx_res_list, tx_lang_list = self._manifest
+        if english_mode:
+            return list(english_files), [], []
+        return list(file_list), list(tx_res_list), list(tx_lang_list)
+
+    def _get_langs(self):
+        """ Return [(tx_lang, native_lang)] """
+        langs = []
+        for lang in self._res_spec['langs']:
+            tx_lang = lang.items()[0][0]
+            native_lang = lang.items()[0][1] if lang.items()[0][1] else tx_lang
+            langs.append((tx_lang, native_lang))
+        return langs
+
+    @timed_phase("manifest")
+    def _build_manifest(self):
+        """ Return the English file list and the (lang file, tx resource, tx lang) lists derived from it """
+        english_list = []
         file_list = []
         tx_res_list = []
         tx_lang_list = []
+        resource_files = {}
+        langs = self._get_langs()
         for item in self._res_spec['resources']:
             path, filename = os.path.split(item[0])
             filename_only, ext = os.path.splitext(filename)
             if "%s" in path:
                 # typically an ios/android resource
-                if english_mode:
-                    english_file = os.path.join(self._src_folder, item[0] % item[2])
-                    file_list.append(english_file)
-                else:
-                    # Convert English filenames to lang filenames
-                    for lang in self._res_spec['langs']:
-                        tx_lang = lang.items()[0][0]
-                        native_lang = lang.items()[0][1] if lang.items()[0][1] else tx_lang
-                        native_lang_with_prefix = item[1] + native_lang
-                        file_list.append(os.path.join(self._src_folder, item[0] % native_lang_with_prefix))
-                        tx_res_list.append(filename)
-                        tx_lang_list.append(tx_lang)
+                english_list.append(os.path.join(self._src_folder, item[0] % item[2]))
+                self._check_resource_name(resource_files, filename, english_list[-1])
+                # Convert English filenames to lang filenames
+                for tx_lang, native_lang in langs:
+                    native_lang_with_prefix = item[1] + native_lang
+                    file_list.append(os.path.join(self._src_folder, item[0] % native_lang_with_prefix))
+                    tx_res_list.append(filename)
+                    tx_lang_list.append(tx_lang)
             else:
                 # typically a newton resource
                 if item[2]:
@@ -97,24 +1262,116 @@ class ResourceInfo(object):
                     filename_english = filename_only + ext
                 full_filespec = os.path.join(self._src_folder, os.path.join(path, filename_english))
                 english_files = self._get_english_files(full_filespec, item[1])
-                if english_mode:
-                    file_list.extend(english_files)
-                else:
-                    # Convert English filenames to lang filenames
-                    for lang in self._res_spec['langs']:
-                        tx_lang = lang.items()[0][0]
-                        native_lang = lang.items()[0][1] if lang.items()[0][1] else tx_lang
-                        for english_file in english_files:
-                            path, filename = os.path.split(english_file)
-                            filename_only, ext = os.path.splitext(filename)
-                            if item[2]:
-                                lang_file = os.path.join(path, filename_only[:-len(item[2])] + native_lang + ext)
-                            else:
-                                lang_file = os.path.join(path, filename_only + item[1] + native_lang + ext)
-                            file_list.append(lang_file)
-                            tx_res_list.append(filename)
-                            tx_lang_list.append(tx_lang)
-        return file_list, tx_res_list, tx_lang_list
+                english_list.extend(english_files)
+                for english_file in english_files:
+                    self._check_resource_name(resource_files, os.path.basename(english_file), english_file)
+                # Convert English filenames to lang filenames
+                english_parts = []
+                for english_file in english_files:
+                    path, filename = os.path.split(english_file)
+                    english_parts.append((path, filename) + os.path.splitext(filename))
+                for tx_lang, native_lang in langs:
+                    for path, filename, filename_only, ext in english_parts:
+                        if item[2]:
+                            lang_file = os.path.join(path, filename_only[:-len(item[2])] + native_lang + ext)
+                        else:
+                            lang_file = os.path.join(path, filename_only + item[1] + native_lang + ext)
+                        file_list.append(lang_file)
+                        tx_res_list.append(filename)
+                        tx_lang_list.append(tx_lang)
+        return english_list, file_list, tx_res_list, tx_lang_list
+
+    def _check_resource_name(self, resource_files, resource_name, english_file):
+        """
+        Transifex resources are named (and slugged) by file name alone, so two English files with the same name
+        (ex: 'project/**/l10n/*.json' matching a/l10n/m.json and b/l10n/m.json) would overwrite each other's resource
+        """
+        resource_slug = slugify(resource_name)
+        other_file = resource_files.setdefault(resource_slug, english_file)
+        if other_file != english_file:
+            raise TransUpdateError("ERROR: '%s' and '%s' would both be Transifex resource '%s', resource file names must be unique" %
+                                   (other_file, english_file, resource_slug))
+
+    def _get_foreign_lang_pattern(self, lang_prefix):
+        if lang_prefix not in self._foreign_lang_patterns:
+            pattern = ".*" + re.escape(lang_prefix) + "(" + '|'.join(lang for lang in self._lang_exclude) + ")$"
+            self._foreign_lang_patterns[lang_prefix] = re.compile(pattern)
+        return self._foreign_lang_patterns[lang_prefix]
+
+    def _scan_dir(self, path):
+        """
+        Return (sorted entry names, {name: kind}) of path, from a single directory read. kind is _DIR, _FILE or _OTHER
+        from scandir's d_type; the listdir fallback returns no kinds ({}) and its entries are only stat'ed if needed.
+        """
+        if path not in self._dir_cache:
+            kinds = {}
+            if scandir is not None:
+                for entry in scandir(path):
+                    # like os.walk, don't follow directory symlinks (avoids '**' loops)
+                    if entry.is_dir(follow_symlinks=False):
+                        kinds[entry.name] = self._DIR
+                    elif entry.is_file():
+                        kinds[entry.name] = self._FILE
+                    else:
+                        kinds[entry.name] = self._OTHER
+                names = kinds.keys()
+            else:
+                names = os.listdir(path)
+            names.sort()
+            self._dir_cache[path] = (names, kinds)
+        return self._dir_cache[path]
+
+    def _get_subdirs(self, path):
+        """ Sorted subdirectory names of path (directory symlinks excluded) """
+        if path not in self._subdir_cache:
+            subdirs = []
+            names, kinds = self._scan_dir(path)
+            for name in names:
+                kind = kinds.get(name, self._UNKNOWN)
+                if kind == self._UNKNOWN:
+                    full_name = os.path.join(path, name)
+                    kind = self._DIR if os.path.isdir(full_name) and not os.path.islink(full_name) else self._OTHER
+                if kind == self._DIR:
+                    subdirs.append(name)
+            self._subdir_cache[path] = subdirs
+        return self._subdir_cache[path]
+
+    def _is_file(self, path, name, kinds):
+        """ Whether an entry of _scan_dir is a regular file (or a symlink to one) """
+        kind = kinds.get(name, self._UNKNOWN)
+        if kind == self._UNKNOWN:
+            return os.path.isfile(os.path.join(path, name))
+        return kind == self._FILE
+
+    def _match_dirs(self, path, dir_matchers):
+        """ Return the directories under path matching dir_matchers (a list of compiled patterns or '**') """
+        if not dir_matchers:
+            return [path]
+        matcher = dir_matchers[0]
+        dirs = self._get_subdirs(path)
+        matched = []
+        if matcher == '**':
+            # '**' matches zero or more directories
+            matched.extend(self._match_dirs(path, dir_matchers[1:]))
+            for name in dirs:
+                matched.extend(self._match_dirs(os.path.join(path, name), dir_matchers))
+        else:
+            for name in dirs:
+                if matcher.match(name):
+                    matched.extend(self._match_dirs(os.path.join(path, name), dir_matchers[1:]))
+        return matched
+
+    def _get_dirs(self, dir_spec):
+        """ Expand any wildcards in a directory spec (only directories below the literal prefix are scanned) """
+        parts = dir_spec.split(os.sep)
+        literal = []
+        while parts and not re.search(r"[*?[]", parts[0]):
+            literal.append(parts.pop(0))
+        base = os.sep.join(literal) or os.sep
+        if not parts:
+            return [base]
+        dir_matchers = [part if part == '**' else re.compile(fnmatch.translate(part)) for part in parts]
+        return self._match_dirs(base, dir_matchers)
 
     def _get_english_files(self, full_filespec, lang_prefix):
         """
@@ -124,14 +1381,17 @@ class ResourceInfo(object):
         ex: "_"
         :return: a list of English-only full filenames
         """
-        pattern = ".*" + lang_prefix + "(" + '|'.join(lang for lang in self._lang_exclude) + ")$"
-        foreign_lang = re.compile(pattern)
+        foreign_lang = self._get_foreign_lang_pattern(lang_prefix)
         english_files = []
-        path, filespec = os.path.split(full_filespec)
-        for filename in os.listdir(path):
-            if fnmatch.fnmatch(filename, filespec):
-                if not foreign_lang.match(os.path.splitext(filename)[0]):
-                    english_files.append(os.path.join(path, filename))
+        dir_spec, filespec = os.path.split(full_filespec)
+        file_matcher = re.compile(fnmatch.translate(filespec))
+        for path in self._get_dirs(dir_spec):
+            names, kinds = self._scan_dir(path)
+            for filename in names:
+                if file_matcher.match(filename):
+                    # only the few English candidates are stat'ed (by the listdir fallback)
+                    if not foreign_lang.match(os.path.splitext(filename)[0]) and self._is_file(path, filename, kinds):
+                        english_files.append(os.path.join(path, filename))
         return english_files
 
 class TransUpdate(object):
@@ -139,12 +1399,27 @@ class TransUpdate(object):
     Update translation info (upload English resources or download translated resources)
     """
 
-    def __init__(self, transuser, transpass, reponame, noprojprefix, clonepath, repolocalizeinfo):
-        self._transifex = OnTransifexAPI(transuser, transpass, 'http://www.transifex.com')
+    def __init__(self, transuser, transpass, reponame, noprojprefix, clonepath, repolocalizeinfo, jobs=_Const.DEFAULT_JOBS,
+                 transurl=_Const.TRANSIFEX_URL, hash_algorithm=_Const.HASH_ALGORITHM_DEFAULT, project_index=0, transifex=None,
+                 parent_branch=None, cksum_store=None):
+        """ transifex: an OnTransifexAPI to share (and its connection pool) with other TransUpdate instances """
+        self._transifex = transifex or OnTransifexAPI(transuser, transpass, transurl, pool_size=jobs)
+        self._jobs = jobs
+        self._hash_algorithm = hash_algorithm
+        self._parent_branch = parent_branch
+        self._cksum_store = cksum_store
+        self._hash_cache = None
+        # digests computed while downloading, so downloaded files don't need to be read back: {file: (stat key, {algorithm: digest})}
+        self._known_digests = {}
+        self._download_hash_algorithms = [hash_algorithm] if hash_algorithm in HASH_FUNCTIONS else []
         self._reponame = reponame
         self._noprojprefix = noprojprefix
         self._clonepath = clonepath
-        self._res_info = ResourceInfo(clonepath, repolocalizeinfo)
+        self._res_info = ResourceInfo(clonepath, repolocalizeinfo, project_index)
+        self._project_slug = None
+        self._resource_names = None
+        # checksum and other state files are per project
+        self._cksum_name = reponame + self._res_info.proj_suffix
         self._transifex_i18n_type = {
             "po": "PO",
             "properties": "UNICODEPROPERTIES",
@@ -164,14 +1439,36 @@ class TransUpdate(object):
         else:
             raise TransUpdateError("ERROR: unrecognised extension in filename: '%s'" % full_filename)
 
+    @property
+    def project_name(self):
+        """ Repo name plus project suffix, names the project's checksum files and metrics """
+        return self._cksum_name
+
+    def invalidate_caches(self, metadata=False):
+        """ Forget the resource file list and download digests (and optionally the cached Transifex project/resource metadata) """
+        self._res_info.invalidate()
+        self._known_digests = {}
+        if metadata:
+            self._project_slug = None
+            self._resource_names = None
+
+    def get_resource_files(self, english_mode=True):
+        file_list, __, __ = self._res_info.get(english_mode)
+        return file_list
+
     def _get_proj_slug(self):
-        """ Get the Transifex project slug """
+        """ Get the Transifex project slug (checked once, then cached) """
+        if self._project_slug is None:
+            self._project_slug = self._find_proj_slug()
+        return self._project_slug
+
+    def _find_proj_slug(self):
         if self._noprojprefix:
-            proj_name = self._reponame
+            proj_name = self._reponame + self._res_info.proj_suffix
         else:
-            proj_name = "%s%s" % (_Const.TRANSIFEX_PROJ_PREFIX, self._reponame)
+            proj_name = "%s%s%s" % (_Const.TRANSIFEX_PROJ_PREFIX, self._reponame, self._res_info.proj_suffix)
         project_slug = slugify(proj_name)
-        if not self._transifex.project_exists(project_slug):
+        if not call_with_retry(self._transifex.project_exists, project_slug):
             raise TransUpdateError("ERROR: project does not exist: '%s'" % project_slug)
         return project_slug
 
@@ -201,72 +1498,380 @@ class TransUpdate(object):
         msg = "%d changed/new resource(s) out of %d total" % (len(res_filelist), len(file_list))
         return res_filelist, msg
 
-    def upload_source_files(self, filelist, filehash, cksum_folder, git_branch, download_path):
+    def _git(self, git_args, stdin_data=None):
+        """ Run a git command in the clone and return its output """
+        try:
+            proc = subprocess.Popen(["git"] + git_args, cwd=self._clonepath, stdin=subprocess.PIPE,
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError as e:
+            raise TransUpdateError("ERROR: running git: %s" % e)
+        out, err = proc.communicate(stdin_data)
+        if proc.returncode != 0:
+            raise TransUpdateError("ERROR: git %s failed: %s" % (git_args[0], err.strip()))
+        return out
+
+    def _git_toplevel(self):
+        return os.path.realpath(self._git(["rev-parse", "--show-toplevel"]).strip())
+
+    def _git_relpath(self, toplevel, file):
+        return os.path.relpath(os.path.realpath(file), toplevel)
+
+    def _git_dirty_paths(self):
+        """ Paths (relative to the top level) with uncommitted changes or untracked """
+        dirty = set()
+        entries = self._git(["status", "--porcelain", "-z", "--untracked-files=all"]).split("\0")
+        i = 0
+        while i < len(entries):
+            entry = entries[i]
+            if entry:
+                dirty.add(entry[3:])
+                if entry[0] in "RC":
+                    # renames/copies are followed by the original path
+                    i += 1
+                    dirty.add(entries[i])
+            i += 1
+        return dirty
+
+    def _git_head_blobs(self, paths=None):
+        """ Blob IDs of paths (default: the whole tree) in HEAD, read from git's object store (no file contents are read) """
+        blobs = {}
+        if paths is None:
+            chunks = [[]]
+        else:
+            paths = sorted(paths)
+            chunks = [paths[i:i + _Const.GIT_PATHS_PER_CALL] for i in range(0, len(paths), _Const.GIT_PATHS_PER_CALL)]
+        for chunk in chunks:
+            if paths is not None and not chunk:
+                continue
+            for entry in self._git(["ls-tree", "-r", "-z", "--full-tree", "HEAD", "--"] + chunk).split("\0"):
+                if entry:
+                    info, path = entry.split("\t", 1)
+                    blobs[path] = info.split()[2]
+        return blobs
+
+    def _git_hash_objects(self, toplevel, paths):
+        """ Blob IDs of working tree files (only used for the few dirty files) """
+        paths = sorted(path for path in paths if os.path.isfile(os.path.join(toplevel, path)))
+        if not paths:
+            return {}
+        out = self._git(["hash-object", "--stdin-paths"], "".join(os.path.join(toplevel, path) + "\n" for path in paths))
+        return dict(zip(paths, out.split()))
+
+    def _get_current_blobs(self, toplevel, candidates, dirty):
+        """ Current blob IDs of candidates: from HEAD when clean, hashed when dirty (deleted files are omitted) """
+        clean = candidates - dirty
+        blobs = self._git_head_blobs(clean) if clean else {}
+        blobs.update(self._git_hash_objects(toplevel, candidates & dirty))
+        return blobs
+
+    def _get_filtered_upload_list_by_git_compare(self, cksum_folder, git_branch, download_path, cksum_file_suffix):
+        """
+        Find changed English resources from git object IDs instead of file hashes: only resources touched by
+        `git diff-tree` since the last synced commit, new resources and dirty files are looked at.
+        Files that were dirty on the last run are looked at again, since an uncommitted edit can be reverted
+        without a new commit.
+        The first run (no recorded git state) falls back to comparing file hashes and records the git state.
+        Returns (changed files, message, new git state)
+        """
+        file_list, __, __ = self._res_info.get()
+        toplevel = self._git_toplevel()
+        res_paths = dict((self._git_relpath(toplevel, file), file) for file in file_list)
+        head = self._git(["rev-parse", "HEAD"]).strip()
+        dirty = self._git_dirty_paths() & set(res_paths)
+        state = self._read_previous_hashinfo(cksum_folder, git_branch, _Const.GIT_STATE_SUFFIX)
+        previous_blobs = state.get('blobs', {})
+        if state.get('commit'):
+            try:
+                self._git(["cat-file", "-e", "%s^{commit}" % state['commit']])
+            except TransUpdateError:
+                # ex: history rewritten, fall back to hashing
+                state = {}
+        if not state.get('commit'):
+            res_files, msg = self._get_filtered_upload_list_by_cksum_compare(cksum_folder, git_branch, download_path, cksum_file_suffix)
+            blobs = self._git_head_blobs()
+            current_blobs = dict((path, blobs[path]) for path in res_paths if path in blobs)
+            current_blobs.update(self._git_hash_objects(toplevel, dirty))
+            return res_files, msg + " (no git state yet, compared file hashes)", {'commit': head, 'blobs': current_blobs, 'dirty': sorted(dirty)}
+        committed = set(self._git(["diff-tree", "-r", "-z", "--name-only", "--no-renames", state['commit'], head]).split("\0"))
+        was_dirty = set(state.get('dirty', []))
+        candidates = (committed | dirty | was_dirty | (set(res_paths) - set(previous_blobs))) & set(res_paths)
+        current_blobs = self._get_current_blobs(toplevel, candidates, dirty)
+        changed = set(path for path in candidates if path in current_blobs and current_blobs[path] != previous_blobs.get(path))
+        res_files = [res_paths[path] for path in sorted(changed)]
+        blobs = dict((path, blob) for path, blob in previous_blobs.iteritems() if path in res_paths)
+        blobs.update(current_blobs)
+        msg = "%d changed/new resource(s) out of %d total (%d checked since commit %s)" % (len(res_files), len(file_list), len(candidates), state['commit'][:10])
+        return res_files, msg, {'commit': head, 'blobs': blobs, 'dirty': sorted(dirty)}
+
+    def _write_git_state(self, cksum_folder, git_branch, git_state, failed):
+        """ Record the synced commit, resource blob IDs and dirty paths, leaving out failed uploads so they're retried """
+        toplevel = self._git_toplevel()
+        blobs = dict(git_state['blobs'])
+        for file in failed:
+            blobs.pop(self._git_relpath(toplevel, file), None)
+        state = {'commit': git_state['commit'], 'blobs': blobs, 'dirty': git_state['dirty']}
+        state_filename = self._get_hash_filename(cksum_folder, git_branch, self._cksum_name, _Const.GIT_STATE_SUFFIX)
+        write_file_atomically(state_filename, json.dumps(state, sort_keys=True))
+
+    def upload_source_files(self, filelist, filehash, cksum_folder, git_branch, download_path, gitchanges=False):
         """ Upload English resource files to Transifex """
         project_slug = self._get_proj_slug()
 
-        curr_res_names = []
-        curr_res_info = self._transifex.list_resources(project_slug)
-        if curr_res_info:
-            curr_res_names = [item['name'] for item in curr_res_info]
+        curr_res_names = self._get_resource_names(project_slug)
 
-        cksum_file_suffix = "english"
+        cksum_file_suffix = _Const.CKSUM_SUFFIXES[1]
+        git_state = None
         if filehash:
             res_files, msg = self._get_filtered_upload_list_by_cksum_compare(cksum_folder, git_branch, download_path, cksum_file_suffix)
+        elif gitchanges:
+            res_files, msg, git_state = self._get_filtered_upload_list_by_git_compare(cksum_folder, git_branch, download_path, cksum_file_suffix)
         else:
             res_files, msg = self._get_filtered_upload_list(filelist)
 
         print msg
-        for res_file in res_files:
-            filename = os.path.basename(res_file)
-            i18n_type = self._get_i18n_type(res_file)
-            print "Uploading %s" % res_file
-            if filename in curr_res_names:
-                # update resource strings
-                self._transifex.update_source_translation(project_slug, res_file, i18n_type=i18n_type)
-            else:
-                # create resource
-                self._transifex.new_resource(project_slug, res_file, resource_name=filename, i18n_type=i18n_type)
-                #for lang in self._res_info['langs']:
-                #    self._transifex.new_language(project_slug, lang, ["buildmaster"])
+        journal = None
+        if cksum_folder and git_branch:
+            journal = UploadJournal(self._get_hash_filename(cksum_folder, git_branch, self._cksum_name, _Const.UPLOAD_JOURNAL_SUFFIX))
+        uploaded, failed = self._upload_files(project_slug, res_files, curr_res_names, download_path, cksum_folder, journal)
 
-        if filehash and len(res_files) > 0:
+        if git_state:
+            self._write_git_state(cksum_folder, git_branch, git_state, failed)
+
+        if filehash and len(uploaded) > 0:
             # update English resource hashes
-            self.write_cksumfile(cksum_folder, git_branch, download_path, cksum_file_suffix=cksum_file_suffix, english_mode=True)
+            if failed:
+                self._update_cksumfile(cksum_folder, git_branch, download_path, uploaded, cksum_file_suffix)
+            else:
+                self.write_cksumfile(cksum_folder, git_branch, download_path, cksum_file_suffix=cksum_file_suffix, english_mode=True)
 
+        if failed:
+            raise TransUpdateError("ERROR: %d of %d resource uploads failed (completed uploads will be skipped when retried): %s" %
+                                   (len(failed), len(res_files), ", ".join(failed)))
+        if journal is not None:
+            journal.remove()
         return _Const.EXIT_OK
 
-    def _compute_file_hash(self, filename, nBufferSize=8192):
-        if not os.path.exists(filename):
-            raise TransUpdateError("ERROR: file does not exist: '%s'" % filename)
-        with open(filename) as fp:
-            m = hashlib.md5()
-            fp.seek(0)
-            s = fp.read(nBufferSize)
-            while s:
-                m.update(s)
-                s = fp.read(nBufferSize)
-        return m.hexdigest()
+    def _get_resource_names(self, project_slug):
+        """ Names of the project's existing Transifex resources (listed once, then cached and kept up to date) """
+        if self._resource_names is None:
+            curr_res_info = call_with_retry(self._transifex.list_resources, project_slug)
+            self._resource_names = set(item['name'] for item in curr_res_info or [])
+        return self._resource_names
 
-    def _download_from_transifex(self, download_path, file_list, tx_res_list, tx_lang_list):
-        """ Download translated resource files and return completion stats"""
-        stats_all = {}
-        project_slug = self._get_proj_slug()
-        for i, file in enumerate(file_list):
-            lang = tx_lang_list[i]
-            resource_slug = slugify(tx_res_list[i])
-            create_path(os.path.dirname(file))
-            print "Downloading %s" % file
-            self._transifex.get_translation(project_slug, resource_slug, lang, file)
-            stats = self._transifex.get_statistics(project_slug, resource_slug, lang)
+    def _upload_file(self, project_slug, res_file, curr_res_names):
+        filename = os.path.basename(res_file)
+        i18n_type = self._get_i18n_type(res_file)
+        print_line("Uploading %s" % res_file)
+        if filename in curr_res_names:
+            # update resource strings
+            call_with_retry(self._transifex.update_source_translation, project_slug, res_file, i18n_type=i18n_type)
+        else:
+            # create resource
+            call_with_retry(self._transifex.new_resource, project_slug, res_file, resource_name=filename, i18n_type=i18n_type)
+            curr_res_names.add(filename)
+            #for lang in self._res_info['langs']:
+            #    self._transifex.new_language(project_slug, lang, ["buildmaster"])
+
+    @timed_phase("upload")
+    def _upload_files(self, project_slug, res_files, curr_res_names, download_path, cksum_folder, journal):
+        """
+        Upload res_files using up to self._jobs concurrent requests. Every file is attempted even if some fail.
+        Files recorded in the journal with the same digest are skipped and each completed upload is journaled.
+        Returns (uploaded or skipped files, failed files)
+        """
+        digests = {}
+        if journal is not None:
+            digests = self._compute_current_hashinfo(download_path, res_files, cksum_folder, self._hash_algorithm)
+
+        def upload(res_file):
+            filename = res_file[len(download_path)+1:]
+            if journal is not None and journal.is_done(filename, digests[filename]):
+                print_line("Skipping %s (already uploaded by an earlier attempt)" % res_file)
+                return
+            self._upload_file(project_slug, res_file, curr_res_names)
+            if journal is not None:
+                journal.record(filename, digests[filename])
+
+        results = WorkerPool(self._jobs).map(upload, res_files, stop_on_error=False)
+        uploaded = []
+        failed = []
+        for res_file, result in zip(res_files, results):
+            if isinstance(result, Exception):
+                print_line("ERROR: uploading %s: %s" % (res_file, result))
+                failed.append(res_file)
+            else:
+                uploaded.append(res_file)
+        return uploaded, failed
+
+    def _compute_file_hash(self, filename, algorithm=_Const.HASH_ALGORITHM_DEFAULT, nBufferSize=8192):
+        return compute_file_hash(filename, algorithm, nBufferSize)
+
+    def _download_translation(self, project_slug, file, resource_slug, lang):
+        """ Download one translated resource file, keeping the digests computed as it streamed in """
+        create_path(os.path.dirname(file))
+        print_line("Downloading %s" % file)
+        digests = call_with_retry(self._transifex.get_translation, project_slug, resource_slug, lang, file,
+                                  self._download_hash_algorithms)
+        st = os.stat(file)
+        self._known_digests[file] = (FileHashCache.stat_key(st), digests)
+        if self._hash_cache:
+            for algorithm, digest in digests.iteritems():
+                self._hash_cache.put(file, st, algorithm, digest)
+
+    @timed_phase("stats")
+    def _get_all_stats(self, download_path, project_slug, work):
+        """
+        Completion stats of each (file, resource slug, lang) of work: {filename_lang: stats}. Each language's stats
+        also carry the last update of the resource's source strings (from the same bulk response).
+        """
+        resource_stats = self._get_resource_stats(project_slug, sorted(set(item[1] for item in work)))
+        stats_all = collections.OrderedDict()
+        for file, resource_slug, lang in work:
+            stats = self._get_stats(project_slug, resource_stats, resource_slug, lang)
+            if stats is not None:
+                source_stats = resource_stats.get(resource_slug, {}).get(_Const.TRANSIFEX_SOURCE_LANG) or {}
+                stats[_Const.STATS_SOURCE_LAST_UPDATE] = source_stats.get('last_update')
             stats_all[file[len(download_path)+1:]] = stats
         return stats_all
 
-    def _compute_current_hashinfo(self, download_path, file_list):
+    def _get_resource_stats(self, project_slug, resource_slugs):
+        """ Fetch completion stats for all languages of each resource (one request per resource): {slug: {lang: stats}} """
+        pool = WorkerPool(self._jobs)
+        results = pool.map(lambda slug: call_with_retry(self._transifex.get_all_statistics, project_slug, slug), resource_slugs)
+        return dict(zip(resource_slugs, results))
+
+    def _get_stats(self, project_slug, resource_stats, resource_slug, lang):
+        stats = resource_stats.get(resource_slug, {}).get(lang)
+        if stats is None:
+            # language not (yet) in the bulk response
+            stats = call_with_retry(self._transifex.get_statistics, project_slug, resource_slug, lang)
+        return stats
+
+    def _remote_changed(self, stats, previous_stats):
+        if previous_stats is None:
+            return True
+        return any(stats.get(key) != previous_stats.get(key) for key in _Const.STATS_SNAPSHOT_KEYS)
+
+    def _download_from_transifex(self, download_path, file_list, tx_res_list, tx_lang_list, stats_snapshot=None, file_done=None):
+        """
+        Download translated resource files (using up to self._jobs concurrent requests) and return completion stats.
+        If stats_snapshot is supplied only the files whose remote stats moved since the snapshot (or that are missing
+        locally) are downloaded, the others are left in place.
+        file_done(file, lang, stats) is called from the download threads as each file completes (and up front for the
+        files left in place).
+        """
+        project_slug = self._get_proj_slug()
+        remove_stale_temp_files(file_list)
+        work = [(file, slugify(tx_res_list[i]), tx_lang_list[i]) for i, file in enumerate(file_list)]
+        stats_all = self._get_all_stats(download_path, project_slug, work)
+        if stats_snapshot is not None:
+            changed_work = []
+            unchanged_work = []
+            for item in work:
+                filename_lang = item[0][len(download_path)+1:]
+                if not os.path.exists(item[0]) or self._remote_changed(stats_all[filename_lang], stats_snapshot.get(filename_lang)):
+                    changed_work.append(item)
+                else:
+                    unchanged_work.append(item)
+            print "Downloading %d of %d translated resources (remote stats unchanged for the rest)" % (len(changed_work), len(work))
+            if file_done:
+                for file, __, lang in unchanged_work:
+                    file_done(file, lang, stats_all[file[len(download_path)+1:]])
+            work = changed_work
+
+        def download(item):
+            self._download_translation(project_slug, *item)
+            if file_done:
+                file_done(item[0], item[2], stats_all[item[0][len(download_path)+1:]])
+        self._download_files(download, work)
+        return stats_all
+
+    @timed_phase("download")
+    def _download_files(self, download, work):
+        pool = WorkerPool(self._jobs)
+        pool.map(download, work)
+
+    def _write_stats_snapshot(self, cksum_folder, git_branch, stats_all):
+        """
+        Record the stats the downloaded files correspond to. This is only a pending snapshot: it's promoted by
+        write_cksumfile, i.e. once the downloaded files have been accepted alongside their checksums (a daemon
+        promotes it after each download).
+        """
+        snapshot = {}
+        for filename_lang, stats in stats_all.iteritems():
+            snapshot[filename_lang] = dict((key, stats.get(key)) for key in _Const.STATS_SNAPSHOT_KEYS)
+        snapshot_filename = self._get_hash_filename(cksum_folder, git_branch, self._cksum_name, _Const.STATS_SNAPSHOT_PENDING_SUFFIX)
+        write_file_atomically(snapshot_filename, json.dumps(snapshot, sort_keys=True))
+
+    def promote_stats_snapshot(self, cksum_folder, git_branch):
+        """ Make the pending stats snapshot the baseline of the next -sf download """
+        pending_filename = self._get_hash_filename(cksum_folder, git_branch, self._cksum_name, _Const.STATS_SNAPSHOT_PENDING_SUFFIX)
+        if os.path.exists(pending_filename):
+            snapshot_filename = self._get_hash_filename(cksum_folder, git_branch, self._cksum_name, _Const.STATS_SNAPSHOT_SUFFIX)
+            os.rename(pending_filename, snapshot_filename)
+
+    def _get_hash_cache(self, cksum_folder):
+        if self._hash_cache is None:
+            self._hash_cache = FileHashCache(os.path.join(cksum_folder, _Const.HASH_CACHE_FILENAME % self._cksum_name))
+        return self._hash_cache
+
+    def _get_known_digest(self, file, st, hash_cache, algorithm):
+        """ The digest of file from its download or the hash cache, or None when it has to be hashed """
+        digest = None
+        known_digests = self._known_digests.get(file)
+        if known_digests and known_digests[0] == FileHashCache.stat_key(st):
+            # the file is still as downloaded
+            digest = known_digests[1].get(algorithm)
+        if not digest and hash_cache:
+            digest = hash_cache.get(file, st, algorithm)
+        return digest
+
+    def _get_file_digest(self, file, algorithm):
+        """ The digest of one file (ex: as its download completes), hashing it if it isn't known """
+        try:
+            st = os.stat(file)
+        except OSError:
+            raise TransUpdateError("ERROR: file does not exist: '%s'" % file)
+        # timed per file as it's called from the download threads (so it also overlaps the download phase)
+        with metrics.phase("hash"):
+            digest = self._get_known_digest(file, st, self._hash_cache, algorithm)
+            if not digest:
+                digest = self._compute_file_hash(file, algorithm)
+                if self._hash_cache:
+                    self._hash_cache.put(file, st, algorithm, digest)
+        return digest
+
+    @timed_phase("hash")
+    def _compute_current_hashinfo(self, download_path, file_list, cksum_folder=None, algorithm=_Const.HASH_ALGORITHM_DEFAULT):
+        """ Hash resource files, re-using cached digests of unchanged files and hashing the rest across all cores """
         hashinfo = {}
+        hash_cache = self._get_hash_cache(cksum_folder) if cksum_folder else None
+        misses = []
         for file in file_list:
-            filename = file[len(download_path)+1:]
-            hashinfo[filename] = self._compute_file_hash(file)
+            try:
+                st = os.stat(file)
+            except OSError:
+                raise TransUpdateError("ERROR: file does not exist: '%s'" % file)
+            digest = self._get_known_digest(file, st, hash_cache, algorithm)
+            if digest:
+                hashinfo[file[len(download_path)+1:]] = digest
+            else:
+                misses.append((file, st))
+        if len(misses) >= _Const.PARALLEL_HASH_MIN_FILES and multiprocessing.cpu_count() > 1:
+            pool = multiprocessing.Pool(min(multiprocessing.cpu_count(), len(misses)))
+            try:
+                digests = pool.map(_compute_file_hash_worker, [(file, algorithm) for file, __ in misses])
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            digests = [self._compute_file_hash(file, algorithm) for file, __ in misses]
+        for (file, st), digest in zip(misses, digests):
+            hashinfo[file[len(download_path)+1:]] = digest
+            if hash_cache:
+                hash_cache.put(file, st, algorithm, digest)
+        if hash_cache:
+            hash_cache.save()
         return hashinfo
 
     def _get_hash_filename(self, cksum_folder, git_branch, repo_name, suffix):
@@ -275,7 +1880,7 @@ class TransUpdate(object):
 
     def _read_previous_hashinfo(self, cksum_folder, git_branch, suffix):
         hashinfo = {}
-        hash_filename = self._get_hash_filename(cksum_folder, git_branch, self._reponame, suffix)
+        hash_filename = self._get_hash_filename(cksum_folder, git_branch, self._cksum_name, suffix)
         try:
             with open(hash_filename, "r") as fp:
                 hashinfo = json.load(fp)
@@ -283,19 +1888,81 @@ class TransUpdate(object):
             hashinfo = {}
         return hashinfo
 
+    def _parse_cksum(self, cksum):
+        """
+        Return (algorithm, hashinfo) from checksum file contents, which are either the original flat
+        {filename: md5} format or versioned: {"version": 2, "algorithm": ..., "hashes": {filename: digest}}
+        """
+        if isinstance(cksum.get('version'), int) and isinstance(cksum.get('hashes'), dict):
+            if cksum['version'] > _Const.CKSUM_FORMAT_VERSION:
+                raise TransUpdateError("ERROR: unsupported checksum file version: %d" % cksum['version'])
+            algorithm = cksum.get('algorithm', _Const.HASH_ALGORITHM_DEFAULT)
+            if algorithm not in HASH_ALGORITHMS:
+                raise TransUpdateError("ERROR: checksum file uses an unavailable hash algorithm: '%s'" % algorithm)
+            return algorithm, cksum['hashes']
+        return _Const.HASH_ALGORITHM_DEFAULT, cksum
+
+    def _read_previous_cksum(self, cksum_folder, git_branch, suffix):
+        """ Return (algorithm, hashinfo) of the branch's checksums, falling back to those of the parent branch (if any) """
+        if self._cksum_store is not None:
+            cksum = self._read_stored_cksum(cksum_folder, git_branch, suffix)
+            return cksum if cksum is not None else (_Const.HASH_ALGORITHM_DEFAULT, {})
+        if self._parent_branch and not os.path.exists(self._get_hash_filename(cksum_folder, git_branch, self._cksum_name, suffix)):
+            return self._parse_cksum(self._read_previous_hashinfo(cksum_folder, self._parent_branch, suffix))
+        return self._parse_cksum(self._read_previous_hashinfo(cksum_folder, git_branch, suffix))
+
+    def _read_stored_cksum(self, cksum_folder, git_branch, suffix):
+        """
+        Return (algorithm, hashinfo) from the checksum store, or None.
+        On first use of the store the JSON files of the branch and of its parent branch are carried over.
+        """
+        for branch in (git_branch, self._parent_branch):
+            if branch and not self._cksum_store.exists(branch, self._cksum_name, suffix):
+                self._import_cksumfile(cksum_folder, branch, suffix)
+        return self._cksum_store.read(git_branch, self._cksum_name, suffix, self._parent_branch)
+
+    def _import_cksumfile(self, cksum_folder, git_branch, suffix):
+        hash_filename = self._get_hash_filename(cksum_folder, git_branch, self._cksum_name, suffix)
+        if not os.path.exists(hash_filename):
+            return False
+        algorithm, hashinfo = self._parse_cksum(self._read_previous_hashinfo(cksum_folder, git_branch, suffix))
+        self._cksum_store.write(git_branch, self._cksum_name, suffix, algorithm, hashinfo)
+        return True
+
+    def import_cksumfiles(self, cksum_folder, git_branch):
+        """ Load the branch's JSON checksum files into the checksum store, replacing the checksums it has """
+        for suffix in _Const.CKSUM_SUFFIXES:
+            if self._import_cksumfile(cksum_folder, git_branch, suffix):
+                print "Imported %s" % self._get_hash_filename(cksum_folder, git_branch, self._cksum_name, suffix)
+        return _Const.EXIT_OK
+
+    def export_cksumfiles(self, cksum_folder, git_branch):
+        """ Write the branch's checksums in the store (including any inherited from the parent branch) out as JSON checksum files """
+        for suffix in _Const.CKSUM_SUFFIXES:
+            cksum = self._read_stored_cksum(cksum_folder, git_branch, suffix)
+            if cksum is not None:
+                self._write_cksum_json(cksum_folder, git_branch, suffix, *cksum)
+                print "Exported %s" % self._get_hash_filename(cksum_folder, git_branch, self._cksum_name, suffix)
+        return _Const.EXIT_OK
+
     def _get_changed_and_new_resources(self, cksum_folder, git_branch, download_path, file_list, suffix=""):
         """ Check if there are any changes to resource files compared to last successful download """
         changed_items = []
         if cksum_folder:
-            latest_hashinfo = self._compute_current_hashinfo(download_path, file_list)
-            previous_hashinfo = self._read_previous_hashinfo(cksum_folder, git_branch, suffix)
-            for item, hash in latest_hashinfo.iteritems():
-                if item in previous_hashinfo:
-                    if hash != previous_hashinfo[item]:
-                        changed_items.append(item)
-                else:
+            algorithm, previous_hashinfo = self._read_previous_cksum(cksum_folder, git_branch, suffix)
+            latest_hashinfo = self._compute_current_hashinfo(download_path, file_list, cksum_folder, algorithm)
+            changed_items = self._compare_hashinfo(previous_hashinfo, latest_hashinfo)
+        return changed_items
+
+    def _compare_hashinfo(self, previous_hashinfo, latest_hashinfo):
+        changed_items = []
+        for item, hash in latest_hashinfo.iteritems():
+            if item in previous_hashinfo:
+                if hash != previous_hashinfo[item]:
                     changed_items.append(item)
-            changed_items.sort()
+            else:
+                changed_items.append(item)
+        changed_items.sort()
         return changed_items
 
     def write_download_list_file(self, download_list_file, download_path, file_list):
@@ -304,44 +1971,517 @@ class TransUpdate(object):
                 for file in file_list:
                     fp.write("%s\n" % file[len(download_path)+1:])
 
-    def _display_results(self, stats_all, cksum_folder, git_branch, download_path, file_list):
-        """ Show results and return number of changed/new items """
-        changed = self._get_changed_and_new_resources(cksum_folder, git_branch, download_path, file_list)
-        num_changed = len(changed)
-        print "\nNumber of changed/new files (***): %d" % num_changed
-        line_format = "%-12s%-115s%-16s%-12s%-15s%s"
-        print line_format % ("Completed", "Resource", "Words", "Entities", "Commiter", "Updated")
-        for file in file_list:
+    def _start_report(self, cksum_folder, git_branch, report_writer):
+        """
+        Start the results report (rows are shown and streamed to report_writer as they're added).
+        Given cksum_folder the per-language rollups are kept so the next run can report the change since this one.
+        """
+        previous_rollups = None
+        if cksum_folder:
+            previous_rollups = self._read_previous_hashinfo(cksum_folder, git_branch, _Const.LANGUAGE_ROLLUP_SUFFIX)
+        report = ResultsReport(self._cksum_name, report_writer, previous_rollups)
+        report.start()
+        return report
+
+    @timed_phase("report")
+    def _finish_report(self, report, cksum_folder, git_branch):
+        """ Show the rollups, keep them given cksum_folder and return number of changed/new items """
+        report.finish()
+        if report.missing_stats:
+            raise TransUpdateError("ERROR: no stats for %d resource(s), ex: %s" % (len(report.missing_stats), report.missing_stats[0]))
+        if cksum_folder:
+            self._write_language_rollups(cksum_folder, git_branch, report.rollups)
+        return report.num_changed
+
+    def _display_results(self, stats_all, changed, download_path, file_list, lang_list, cksum_folder=None, git_branch=None,
+                         report_writer=None):
+        """ Show results (and stream them to report_writer) and return number of changed/new items """
+        changed = set(changed)
+        report = self._start_report(cksum_folder, git_branch, report_writer)
+        for file, lang in zip(file_list, lang_list):
             filename_lang = file[len(download_path)+1:]
-            if filename_lang in stats_all:
-                stats = stats_all[filename_lang]
-            else:
-                raise TransUpdateError("ERROR: no stats for %s" % filename_lang)
-            word_total = int(stats['translated_words']) + int(stats['untranslated_words'])
-            word_item = "%s/%d" % (stats['translated_words'], word_total)
-            entity_total = int(stats['translated_entities']) + int(stats['untranslated_entities'])
-            entity_item = "%s/%d" % (stats['translated_entities'], entity_total)
-            completed_item = "*** %s" % stats['completed'] if filename_lang in changed else stats['completed']
-            line = line_format % (completed_item, filename_lang, word_item, entity_item, stats['last_commiter'], stats['last_update'])
-            print line
-        return num_changed
-
-    def process_translated_files(self, cksum_folder, git_branch, download_path, download_list_file):
-        """ Process resources files from Transifex """
+            report.add(filename_lang, lang, stats_all.get(filename_lang), filename_lang in changed)
+        return self._finish_report(report, cksum_folder, git_branch)
+
+    def _write_language_rollups(self, cksum_folder, git_branch, rollups):
+        rollups_filename = self._get_hash_filename(cksum_folder, git_branch, self._cksum_name, _Const.LANGUAGE_ROLLUP_SUFFIX)
+        write_file_atomically(rollups_filename, json.dumps(rollups, sort_keys=True))
+
+    def _select_shard(self, shard, file_list, tx_res_list, tx_lang_list):
+        """
+        The share of the translated resources of shard (index, count), index from 1. Work is partitioned by a stable
+        hash of the Transifex resource name so every language of a resource (and its one bulk stats request) lands on
+        the same shard, whatever the machine or file order.
+        """
+        index, count = shard
+        selected = [i for i, res_name in enumerate(tx_res_list)
+                    if int(hashlib.md5(res_name.encode("utf-8")).hexdigest(), 16) % count == index - 1]
+        print "Shard %d/%d: %d of %d translated resources" % (index, count, len(selected), len(file_list))
+        return [file_list[i] for i in selected], [tx_res_list[i] for i in selected], [tx_lang_list[i] for i in selected]
+
+    def _get_shard_filename(self, shard_folder, git_branch, shard, shard_run):
+        return self._get_hash_filename(shard_folder, git_branch, self._cksum_name,
+                                       _Const.SHARD_SUFFIX % ((self._get_shard_run_tag(shard_run),) + tuple(shard)))
+
+    def _get_shard_run_tag(self, shard_run):
+        """ shard_run as it appears in shard file names """
+        return re.sub(r"[^A-Za-z0-9.-]", "_", shard_run)
+
+    def _get_shard_run(self, shard_run):
+        """ The id tying the shards of a run together: shard_run if given, else the commit checked out in the clone """
+        if shard_run:
+            return shard_run
+        try:
+            return self._git(["rev-parse", "HEAD"]).strip()
+        except TransUpdateError as e:
+            raise TransUpdateError("ERROR: -shr is required when -c isn't a git clone (%s)" % e)
+
+    def _find_shard_files(self, shard_folder, git_branch, shard_run):
+        """
+        The shard result files of run shard_run of this repo/branch in shard_folder: {(index, count): filename}.
+        Other runs' files (ex: another pipeline of the same branch sharing the folder) aren't looked at.
+        """
+        pattern = re.compile(re.escape(os.path.basename(self._get_hash_filename(shard_folder, git_branch, self._cksum_name, "")[:-len(".json")]))
+                             + r"_shard_" + re.escape(self._get_shard_run_tag(shard_run)) + r"_(\d+)of(\d+)\.json$")
+        shard_filenames = {}
+        for filename in os.listdir(shard_folder):
+            match = pattern.match(filename)
+            if match:
+                shard_filenames[(int(match.group(1)), int(match.group(2)))] = os.path.join(shard_folder, filename)
+        return shard_filenames
+
+    def _write_shard(self, shard_folder, git_branch, shard, shard_run, algorithm, files, stats_all, hashinfo):
+        """ Record a shard's partial download list, stats and checksums for -m merge """
+        for (index, count), filename in self._find_shard_files(shard_folder, git_branch, shard_run).iteritems():
+            if count != shard[1]:
+                # left over from an attempt of this run split a different number of ways
+                remove_temp_file(filename)
+        shard_info = {'version': _Const.SHARD_FORMAT_VERSION, 'shard': shard[0], 'shards': shard[1], 'run': shard_run,
+                      'algorithm': algorithm, 'files': files, 'stats': stats_all, 'hashes': hashinfo}
+        shard_filename = self._get_shard_filename(shard_folder, git_branch, shard, shard_run)
+        write_file_atomically(shard_filename, json.dumps(shard_info, sort_keys=True))
+
+    def _read_shards(self, shard_folder, git_branch, shard_run):
+        """ Load the results of every shard of the -m down --shard run shard_run, checking none is missing or from another run """
+        shard_filenames = self._find_shard_files(shard_folder, git_branch, shard_run)
+        counts = set(count for __, count in shard_filenames)
+        if not counts:
+            raise TransUpdateError("ERROR: no shard results for %s run '%s' in %s" % (self._cksum_name, shard_run, shard_folder))
+        if len(counts) > 1:
+            raise TransUpdateError("ERROR: shard results for different shard counts (%s) in %s" %
+                                   (", ".join(str(count) for count in sorted(counts)), shard_folder))
+        count = counts.pop()
+        missing = [str(index) for index in range(1, count + 1) if (index, count) not in shard_filenames]
+        if missing:
+            raise TransUpdateError("ERROR: missing results for shard(s) %s of %d in %s" % (", ".join(missing), count, shard_folder))
+        shards = []
+        for index in range(1, count + 1):
+            with open(shard_filenames[(index, count)], "r") as fp:
+                shard_info = json.load(fp)
+            if shard_info.get('version') != _Const.SHARD_FORMAT_VERSION:
+                raise TransUpdateError("ERROR: unsupported shard results version in %s" % shard_filenames[(index, count)])
+            if shard_info.get('run') != shard_run:
+                raise TransUpdateError("ERROR: results of shard %d of %d are from run '%s', expected '%s' (did the shard fail?)" %
+                                       (index, count, shard_info.get('run'), shard_run))
+            shards.append(shard_info)
+        return shards, [shard_filenames[(index, count)] for index in range(1, count + 1)]
+
+    def merge_shards(self, cksum_folder, git_branch, download_path, download_list_file, shard_folder, shard_run=None, stats_first=False,
+                     report_writer=None):
+        """
+        Combine the results of -m down --shard runs into the download list, report and exit code of a single run.
+        The shard result files are removed once merged.
+        """
+        file_list, __, tx_lang_list = self._res_info.get(english_mode=False)
+        algorithm, previous_hashinfo = self._read_previous_cksum(cksum_folder, git_branch, "")
+        stats_all = {}
+        latest_hashinfo = {}
+        shards, shard_filenames = self._read_shards(shard_folder, git_branch, self._get_shard_run(shard_run))
+        for shard_info in shards:
+            if shard_info['algorithm'] != algorithm:
+                raise TransUpdateError("ERROR: shard %d/%d compared checksums using '%s', expected '%s'" %
+                                       (shard_info['shard'], shard_info['shards'], shard_info['algorithm'], algorithm))
+            stats_all.update(shard_info['stats'])
+            latest_hashinfo.update(shard_info['hashes'])
+        filename_langs = [file[len(download_path)+1:] for file in file_list]
+        missing = [filename_lang for filename_lang in filename_langs if filename_lang not in latest_hashinfo]
+        if missing:
+            raise TransUpdateError("ERROR: %d translated resource(s) not covered by any shard, ex: %s" % (len(missing), missing[0]))
+        if stats_first:
+            self._write_stats_snapshot(cksum_folder, git_branch, stats_all)
+        self.write_download_list_file(download_list_file, download_path, file_list)
+        changed = self._compare_hashinfo(previous_hashinfo, dict((item, latest_hashinfo[item]) for item in filename_langs))
+        num_changed = self._display_results(stats_all, changed, download_path, file_list, tx_lang_list, cksum_folder, git_branch,
+                                            report_writer)
+        for shard_filename in shard_filenames:
+            remove_temp_file(shard_filename)
+        exit_val = _Const.EXIT_OK if num_changed else _Const.EXIT_OK_NOCHANGES
+        return exit_val
+
+    def process_translated_files(self, cksum_folder, git_branch, download_path, download_list_file, stats_first=False,
+                                 shard=None, shard_folder=None, shard_run=None, report_writer=None):
+        """
+        Process resources files from Transifex.
+        With shard=(index, count) only that shard's share is downloaded and its results are left in shard_folder for -m merge.
+        """
         file_list, tx_res_list, tx_lang_list = self._res_info.get(english_mode=False)
-        stats = self._download_from_transifex(download_path, file_list, tx_res_list, tx_lang_list)
+        # only this run's downloads count (ex: a daemon's earlier downloads may have been replaced by a git pull since)
+        self._known_digests = {}
+        if shard:
+            shard_run = self._get_shard_run(shard_run)
+            file_list, tx_res_list, tx_lang_list = self._select_shard(shard, file_list, tx_res_list, tx_lang_list)
+        compare_algorithm, previous_hashinfo = None, {}
+        if cksum_folder:
+            # hash downloads as they arrive, with the algorithm the change check needs and the one -m cksumfile will use
+            compare_algorithm, previous_hashinfo = self._read_previous_cksum(cksum_folder, git_branch, "")
+            self._download_hash_algorithms = sorted(set(algorithm for algorithm in (compare_algorithm, self._hash_algorithm)
+                                                        if algorithm in HASH_FUNCTIONS))
+            self._get_hash_cache(cksum_folder)
+        stats_snapshot = None
+        if stats_first:
+            stats_snapshot = self._read_previous_hashinfo(cksum_folder, git_branch, _Const.STATS_SNAPSHOT_SUFFIX)
+        # a shard's rollups are partial, -m merge keeps the run's rollups
+        report_cksum_folder = None if shard else cksum_folder
+        report = self._start_report(report_cksum_folder, git_branch, report_writer)
+        latest_hashinfo = {}
+
+        def file_done(file, lang, stats):
+            # compare and report each file as it completes
+            filename_lang = file[len(download_path)+1:]
+            changed = False
+            if cksum_folder:
+                latest_hashinfo[filename_lang] = self._get_file_digest(file, compare_algorithm)
+                changed = latest_hashinfo[filename_lang] != previous_hashinfo.get(filename_lang)
+            report.add(filename_lang, lang, stats, changed)
+        stats = self._download_from_transifex(download_path, file_list, tx_res_list, tx_lang_list, stats_snapshot, file_done)
+        if self._hash_cache:
+            self._hash_cache.save()
+        if stats_first and not shard:
+            # a sharded run's snapshot is written by -m merge
+            self._write_stats_snapshot(cksum_folder, git_branch, stats)
         self.write_download_list_file(download_list_file, download_path, file_list)
-        num_changed = self._display_results(stats, cksum_folder, git_branch, download_path, file_list)
+        if shard:
+            self._write_shard(shard_folder, git_branch, shard, shard_run, compare_algorithm, [file[len(download_path)+1:] for file in file_list],
+                              stats, latest_hashinfo)
+        num_changed = self._finish_report(report, report_cksum_folder, git_branch)
         exit_val = _Const.EXIT_OK if num_changed else _Const.EXIT_OK_NOCHANGES
         return exit_val
 
+    def _write_cksum(self, cksum_folder, git_branch, cksum_file_suffix, algorithm, hashinfo):
+        if self._cksum_store is not None:
+            self._cksum_store.write(git_branch, self._cksum_name, cksum_file_suffix, algorithm, hashinfo)
+        else:
+            self._write_cksum_json(cksum_folder, git_branch, cksum_file_suffix, algorithm, hashinfo)
+
+    def _write_cksum_json(self, cksum_folder, git_branch, cksum_file_suffix, algorithm, hashinfo):
+        hash_filename = self._get_hash_filename(cksum_folder, git_branch, self._cksum_name, cksum_file_suffix)
+        cksum = {'version': _Const.CKSUM_FORMAT_VERSION, 'algorithm': algorithm, 'hashes': hashinfo}
+        write_file_atomically(hash_filename, json.dumps(cksum, sort_keys=True))
+
+    def _update_cksumfile(self, cksum_folder, git_branch, download_path, file_list, cksum_file_suffix):
+        """ Update the checksums of just file_list (ex: the uploads that succeeded), keeping the other previous values """
+        algorithm, hashinfo = self._read_previous_cksum(cksum_folder, git_branch, cksum_file_suffix)
+        latest_hashinfo = self._compute_current_hashinfo(download_path, file_list, cksum_folder, algorithm)
+        if self._cksum_store is not None:
+            self._cksum_store.update(git_branch, self._cksum_name, cksum_file_suffix, algorithm, latest_hashinfo, self._parent_branch)
+        else:
+            hashinfo.update(latest_hashinfo)
+            self._write_cksum(cksum_folder, git_branch, cksum_file_suffix, algorithm, hashinfo)
+
     def write_cksumfile(self, cksum_folder, git_branch, download_path, cksum_file_suffix="", english_mode=False):
         """ Write resource file checksum info """
         file_list, __, __ = self._res_info.get(english_mode)
-        latest_hashinfo = self._compute_current_hashinfo(download_path, file_list)
-        hash_filename = self._get_hash_filename(cksum_folder, git_branch, self._reponame, cksum_file_suffix)
-        with open(hash_filename, "w") as fp:
-            json.dump(latest_hashinfo, fp, sort_keys=True)
+        latest_hashinfo = self._compute_current_hashinfo(download_path, file_list, cksum_folder, self._hash_algorithm)
+        self._write_cksum(cksum_folder, git_branch, cksum_file_suffix, self._hash_algorithm, latest_hashinfo)
+        if not english_mode:
+            self.promote_stats_snapshot(cksum_folder, git_branch)
+        return _Const.EXIT_OK
+
+
+class DirectoryWatcher(object):
+    """
+    Report file changes in a set of directories (non-recursive) through callback(path).
+    Uses inotify (pyinotify) when available, otherwise polls the directories every poll_interval seconds.
+    """
+
+    def __init__(self, callback, poll_interval):
+        self._callback = callback
+        self._poll_interval = poll_interval
+        self._dirs = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        if pyinotify is not None:
+            self._watch_manager = pyinotify.WatchManager()
+            self._notifier = pyinotify.ThreadedNotifier(self._watch_manager, self._on_inotify_event)
+            self._notifier.daemon = True
+            self._watch_descriptors = {}
+        else:
+            self._snapshots = {}
+            self._poller = threading.Thread(target=self._poll)
+            self._poller.daemon = True
+
+    @property
+    def method(self):
+        return "inotify" if pyinotify is not None else "polling every %ss" % self._poll_interval
+
+    def watch(self, dirs):
+        """ Set the watched directories (missing directories are skipped) """
+        dirs = set(path for path in dirs if os.path.isdir(path))
+        with self._lock:
+            for path in self._dirs - dirs:
+                if pyinotify is not None:
+                    self._watch_manager.rm_watch(self._watch_descriptors.pop(path))
+                else:
+                    self._snapshots.pop(path, None)
+            for path in dirs - self._dirs:
+                if pyinotify is not None:
+                    mask = pyinotify.IN_CLOSE_WRITE | pyinotify.IN_MOVED_TO | pyinotify.IN_DELETE | pyinotify.IN_MOVED_FROM
+                    self._watch_descriptors.update(self._watch_manager.add_watch(path, mask))
+                else:
+                    self._snapshots[path] = self._snapshot(path)
+            self._dirs = dirs
+
+    def start(self):
+        if pyinotify is not None:
+            self._notifier.start()
+        else:
+            self._poller.start()
+
+    def stop(self):
+        self._stop.set()
+        if pyinotify is not None:
+            self._notifier.stop()
+
+    def _on_inotify_event(self, event):
+        self._callback(event.pathname)
+
+    def _snapshot(self, path):
+        snapshot = {}
+        try:
+            if scandir is not None:
+                for entry in scandir(path):
+                    if entry.is_file():
+                        st = entry.stat()
+                        snapshot[entry.name] = (st.st_size, st.st_mtime, st.st_ino)
+            else:
+                for name in os.listdir(path):
+                    full_name = os.path.join(path, name)
+                    if os.path.isfile(full_name):
+                        st = os.stat(full_name)
+                        snapshot[name] = (st.st_size, st.st_mtime, st.st_ino)
+        except OSError:
+            pass
+        return snapshot
+
+    def _poll(self):
+        while not self._stop.wait(self._poll_interval):
+            with self._lock:
+                dirs = list(self._dirs)
+            for path in dirs:
+                snapshot = self._snapshot(path)
+                with self._lock:
+                    previous = self._snapshots.get(path)
+                    if previous is None:
+                        continue
+                    self._snapshots[path] = snapshot
+                for name in set(snapshot) | set(previous):
+                    if snapshot.get(name) != previous.get(name):
+                        self._callback(os.path.join(path, name))
+
+class _TriggerHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """ Local control endpoint of SyncDaemon: POST /download, /upload or /refresh, GET /status """
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, obj):
+        body = json.dumps(obj, sort_keys=True)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/status":
+            self._send_json(200, self.server.sync_daemon.status())
+        else:
+            self._send_json(404, {"error": "unknown path"})
+
+    def do_POST(self):
+        command = self.path.strip("/")
+        if command in SyncDaemon.COMMANDS:
+            self.server.sync_daemon.request(command)
+            self._send_json(202, {"queued": command})
+        else:
+            self._send_json(404, {"error": "unknown command, expected one of: %s" % ", ".join(SyncDaemon.COMMANDS)})
+
+class SyncDaemon(object):
+    """
+    Long running sync service: keeps the TransUpdate instances (with their warm Transifex session and cached
+    project/resource metadata) alive, watches the English resource directories and uploads changed files in
+    debounced batches, and runs downloads on demand through a local HTTP trigger, ex:
+        curl -X POST http://localhost:8765/download
+    Work is done one batch at a time on the calling thread, so uploads and downloads never overlap.
+    """
+    COMMANDS = ("download", "upload", "refresh")
+
+    def __init__(self, trans_updates, cksum_folder, git_branch, download_path, download_list_file, stats_first,
+                 debounce_secs, trigger_port, poll_interval):
+        self._trans_updates = trans_updates
+        self._cksum_folder = cksum_folder
+        self._git_branch = git_branch
+        self._download_path = download_path
+        self._download_list_file = download_list_file
+        self._stats_first = stats_first
+        self._debounce_secs = debounce_secs
+        self._trigger_port = trigger_port
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._changed = set()
+        self._last_change = 0
+        self._requests = set()
+        self._ignored = set()
+        self._status = {"started": time.time(), "last_upload": None, "last_download": None, "last_error": None}
+        self._watcher = DirectoryWatcher(self._on_change, poll_interval)
+
+    def status(self):
+        with self._lock:
+            status = dict(self._status)
+            status.update({"pending_changes": len(self._changed), "pending_requests": sorted(self._requests)})
+        return status
+
+    def request(self, command):
+        with self._lock:
+            self._requests.add(command)
+        self._wakeup.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def _on_change(self, path):
+        # ignore our own temp files and translated files written by downloads
+        if path.endswith(".part") or path in self._ignored:
+            return
+        with self._lock:
+            self._changed.add(path)
+            self._last_change = time.time()
+        self._wakeup.set()
+
+    def _record_error(self, e, project=None):
+        print_line("[daemon] ERROR: %s%s" % ("%s: " % project if project else "", e))
+        with self._lock:
+            self._status["last_error"] = {"time": time.time(), "error": str(e), "project": project}
+
+    def _refresh_watch(self):
+        """
+        Rescan the resource specs and watch the directories of the English files.
+        Returns False when the scan failed (ex: a directory removed by a checkout mid-scan, or duplicate resource
+        names); the previous watch is kept and the scan is retried on the next change or trigger.
+        """
+        english_files = []
+        translated_files = set()
+        try:
+            for trans_update in self._trans_updates:
+                trans_update.invalidate_caches()
+                english_files.extend(trans_update.get_resource_files(english_mode=True))
+                translated_files.update(trans_update.get_resource_files(english_mode=False))
+        except (OSError, TransUpdateError) as e:
+            self._record_error(e)
+            return False
+        self._ignored = translated_files
+        self._watcher.watch(set(os.path.dirname(file) for file in english_files))
+        return True
+
+    def _run_all(self, action, status_key):
+        """ Run action for each project, with a '[project]' prefix on its output when there are several, as run_projects does """
+        for trans_update in self._trans_updates:
+            metrics.set_project(trans_update.project_name)
+            output = None
+            if len(self._trans_updates) > 1 and isinstance(sys.stdout, ThreadOutput):
+                output = PrefixedOutput(sys.stdout._stream, trans_update.project_name)
+                set_thread_output(output)
+            error = None
+            try:
+                action(trans_update)
+            except Exception as e:
+                error = e
+            finally:
+                if output:
+                    output.close()
+                    set_thread_output(None)
+            if error:
+                self._record_error(error, trans_update.project_name)
+        with self._lock:
+            self._status[status_key] = time.time()
+
+    def _upload(self):
+        if not self._refresh_watch():
+            return
+        self._run_all(lambda trans_update: trans_update.upload_source_files(None, True, self._cksum_folder, self._git_branch,
+                                                                            self._download_path), "last_upload")
+
+    def _download_project(self, trans_update, download_list_file):
+        trans_update.process_translated_files(self._cksum_folder, self._git_branch, self._download_path, download_list_file,
+                                              self._stats_first)
+        if self._stats_first:
+            # nothing runs -m cksumfile between daemon downloads, so the next one compares against this download's stats
+            trans_update.promote_stats_snapshot(self._cksum_folder, self._git_branch)
+
+    def _download(self):
+        # each project writes its own part of the download list
+        project_dlfs = {}
+        for i, trans_update in enumerate(self._trans_updates):
+            project_dlfs[trans_update] = "%s.%d" % (self._download_list_file, i) if self._download_list_file else None
+        self._run_all(lambda trans_update: self._download_project(trans_update, project_dlfs[trans_update]), "last_download")
+        combine_download_lists(self._download_list_file, [project_dlfs[trans_update] for trans_update in self._trans_updates])
+
+    def _take_work(self):
+        """ Return (upload needed, download needed), holding back file changes until they've settled for debounce_secs """
+        with self._lock:
+            requests = self._requests
+            self._requests = set()
+            upload = "upload" in requests
+            if self._changed and time.time() - self._last_change >= self._debounce_secs:
+                print_line("[daemon] %d file change(s) detected" % len(self._changed))
+                self._changed = set()
+                upload = True
+            return upload, "download" in requests, "refresh" in requests
+
+    def run(self):
+        trigger_server = None
+        if self._trigger_port:
+            trigger_server = BaseHTTPServer.HTTPServer(("127.0.0.1", self._trigger_port), _TriggerHandler)
+            trigger_server.sync_daemon = self
+            trigger_thread = threading.Thread(target=trigger_server.serve_forever)
+            trigger_thread.daemon = True
+            trigger_thread.start()
+            print_line("[daemon] trigger listening on http://127.0.0.1:%d (POST /%s, GET /status)" %
+                       (self._trigger_port, ", /".join(self.COMMANDS)))
+        self._refresh_watch()
+        self._watcher.start()
+        print_line("[daemon] watching resource directories (%s), debounce %ss" % (self._watcher.method, self._debounce_secs))
+        # catch up with changes made while the daemon wasn't running
+        self._upload()
+        try:
+            while not self._stop.is_set():
+                self._wakeup.wait(1.0)
+                self._wakeup.clear()
+                upload, download, refresh = self._take_work()
+                if refresh:
+                    for trans_update in self._trans_updates:
+                        trans_update.invalidate_caches(metadata=True)
+                    self._refresh_watch()
+                if upload:
+                    self._upload()
+                if download:
+                    self._download()
+        finally:
+            self._watcher.stop()
+            if trigger_server:
+                trigger_server.shutdown()
         return _Const.EXIT_OK
 
 
@@ -354,15 +2494,15 @@ def args_check(args):
     args.transpass = transcred['password']
     # Mode
     if args.mode == _Const.MODE_UP:
-        if (not args.filelist and not args.filehash) or (args.filelist and args.filehash):
-            raise TransUpdateError("ERROR: must supply one of either -fl or -fh")
-        if args.filehash:
+        if len([arg for arg in (args.filelist, args.filehash, args.gitchanges) if arg]) != 1:
+            raise TransUpdateError("ERROR: must supply one of either -fl, -fh or -gc")
+        if args.filehash or args.gitchanges:
             if not args.cksumfolder:
                 raise TransUpdateError("ERROR: must supply -ckf")
             if not args.gitbranch:
                 raise TransUpdateError("ERROR: must supply -gitbranch")
     else:
-        # _Const.MODE_UP and _Const.MODE_CKSUMFILE
+        # _Const.MODE_DOWN, _Const.MODE_CKSUMFILE, _Const.MODE_DAEMON, _Const.MODE_MERGE, _Const.MODE_CKSUMIMPORT and _Const.MODE_CKSUMEXPORT
         if not args.cksumfolder:
             raise TransUpdateError("ERROR: must supply -ckf")
         if not args.gitbranch:
@@ -373,13 +2513,35 @@ def args_check(args):
         args.cksumfolder = os.path.expandvars(os.path.expanduser(args.cksumfolder))
         if not os.path.isdir(args.cksumfolder):
             raise TransUpdateError("ERROR: -ckf folder does not exist: %s" % args.cksumfolder)
+    if args.jobs < 1:
+        raise TransUpdateError("ERROR: -j must be at least 1")
+    if args.metricsfile and os.path.splitext(args.metricsfile)[1] == ".prom":
+        raise TransUpdateError("ERROR: -mf is the JSON metrics file, the .prom file is written alongside it: %s" % args.metricsfile)
+    if args.shard and args.mode != _Const.MODE_DOWN:
+        raise TransUpdateError("ERROR: --shard is only supported for -m down")
+    if args.shardfolder:
+        args.shardfolder = os.path.expandvars(os.path.expanduser(args.shardfolder))
+        if not os.path.isdir(args.shardfolder):
+            raise TransUpdateError("ERROR: -shf folder does not exist: %s" % args.shardfolder)
+    else:
+        args.shardfolder = args.cksumfolder
+
+
+def shard_arg(value):
+    """ argparse type for --shard: "i/N" with 1 <= i <= N, returned as (i, N) """
+    match = re.match(r"^(\d+)/(\d+)$", value)
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise argparse.ArgumentTypeError("expected i/N with 1 <= i <= N, ex: 2/4")
+    return int(match.group(1)), int(match.group(2))
 
 
 def args_get():
     parser = argparse.ArgumentParser()
-    parser.add_argument('-m', '--mode', choices=[_Const.MODE_UP, _Const.MODE_DOWN, _Const.MODE_CKSUMFILE], help=r'"up"=upload English source file to Transifex, "down"=download translated files from Transifex', required=True)
-    parser.add_argument('-fl', '--filelist', help=r'One of -fl or -fh required for -m up: file list to filter for English resources or "all" to choose all resources, ex: gitdiff.txt')
-    parser.add_argument('-fh', '--filehash', help=r'One of -fl or -fh required for -m up: determine English resource changes by comparing with previous file hashes', action='store_true')
+    parser.add_argument('-m', '--mode', choices=[_Const.MODE_UP, _Const.MODE_DOWN, _Const.MODE_CKSUMFILE, _Const.MODE_DAEMON, _Const.MODE_MERGE,
+                                                 _Const.MODE_CKSUMIMPORT, _Const.MODE_CKSUMEXPORT], help=r'"up"=upload English source file to Transifex, "down"=download translated files from Transifex, "daemon"=keep running: upload English changes as they happen (as -fh) and download on request, "merge"=combine the results of -m down --shard runs into the download list, report and exit code of a single -m down, "cksumimport"/"cksumexport"=copy the JSON checksum files of the branch into/out of the -cks sqlite store', required=True)
+    parser.add_argument('-fl', '--filelist', help=r'One of -fl, -fh or -gc required for -m up: file list to filter for English resources or "all" to choose all resources, ex: gitdiff.txt')
+    parser.add_argument('-fh', '--filehash', help=r'One of -fl, -fh or -gc required for -m up: determine English resource changes by comparing with previous file hashes', action='store_true')
+    parser.add_argument('-gc', '--gitchanges', help=r'One of -fl, -fh or -gc required for -m up: determine English resource changes from git object IDs since the last synced commit (-c must be a git clone)', action='store_true')
     parser.add_argument('-tc', '--transcred', help=r'Transifex credentials file (JSON) ex: ~/.transifex.json', required=True)
     parser.add_argument('-rl', '--repolocalizeinfo', help=r'Repo localization info file ex: localize_info.json', required=True)
     parser.add_argument('-rn', '--reponame', help=r'Repo name, ex: android, ios, newton', required=True)
@@ -388,29 +2550,176 @@ def args_get():
     parser.add_argument('-gb', '--gitbranch', help=r'Required for -m down: the git branch name, ex: rel-1.43')
     # optional
     parser.add_argument('-dlf', '--download_list_file', help=r'Filename to contain downloaded file list relative to -c')
+    parser.add_argument('-rp', '--reportfile', help=r'-m down/merge: also write the results to this file, a "resource" record per resource/lang then a "language" rollup record per language (with the change since the previous run)')
+    parser.add_argument('-rpf', '--reportformat', choices=[_Const.REPORT_FORMAT_JSONL, _Const.REPORT_FORMAT_CSV], default=_Const.REPORT_FORMAT_JSONL, help=r'-rp file format')
+    parser.add_argument('-sf', '--statsfirst', help=r'Optional for -m down: only download translations whose Transifex stats (last_update, completed) changed since the last -m cksumfile', action='store_true')
+    parser.add_argument('-ha', '--hashalgorithm', choices=HASH_ALGORITHMS, default=_Const.HASH_ALGORITHM_DEFAULT, help=r'Hash algorithm for checksum files written by this run (existing checksum files are compared using the algorithm they were written with). "entity" fingerprints the parsed key/string entries instead of the bytes, so reordering, comments, whitespace and PO header changes are not uploaded or reported as changes')
     parser.add_argument('-d', '--downloadpath', help=r'[Testing use] Optional for -m down (else -clonepath will be used) ex: <Jenkins job workspace>/stage/tmp')
+    parser.add_argument('-j', '--jobs', type=int, default=_Const.DEFAULT_JOBS, help=r'Number of concurrent Transifex requests for -m up and -m down, ex: 8')
+    parser.add_argument('-tu', '--transurl', default=_Const.TRANSIFEX_URL, help=r'[Testing use] Transifex server URL, ex: http://localhost:8099')
+    parser.add_argument('-pi', '--projectindex', type=int, help=r'Only process this project entry of -rl (0 based), default: all projects concurrently')
+    parser.add_argument('-mf', '--metricsfile', help=r'Write run metrics (phase times, API latency histograms, bytes, retries) to this JSON file and a Prometheus textfile collector .prom file alongside it, ex: /var/lib/node_exporter/transupdate_newton.json')
+    parser.add_argument('-cks', '--cksumstore', choices=[_Const.CKSUM_STORE_JSON, _Const.CKSUM_STORE_SQLITE], default=_Const.CKSUM_STORE_JSON, help=r'Keep checksums in per branch JSON files or in a shared SQLite store in -ckf (transactional, safe for concurrent jobs; existing JSON files are imported on first use)')
+    parser.add_argument('-pb', '--parentbranch', help=r'Branch whose checksums a branch without its own starts from, ex: -gb rel-1.43 -pb master')
+    parser.add_argument('-sh', '--shard', type=shard_arg, help=r'-m down: only process shard i of N (resources are split by a stable hash of their name) and leave its results in -shf for -m merge, ex: 2/4')
+    parser.add_argument('-shf', '--shardfolder', help=r'Folder for -m down --shard results read by -m merge (default: -ckf)')
+    parser.add_argument('-shr', '--shardrun', help=r'Id shared by the -m down --shard runs and the -m merge of one sharded run, ex: a CI build number (default: the commit checked out in -c)')
+    parser.add_argument('-wd', '--watchdebounce', type=float, default=_Const.DAEMON_DEBOUNCE_SECS, help=r'-m daemon: seconds English file changes must settle before they are uploaded')
+    parser.add_argument('-tp', '--triggerport', type=int, default=_Const.DAEMON_TRIGGER_PORT, help=r'-m daemon: localhost port for on demand requests (0 to disable), ex: curl -X POST http://localhost:8765/download')
+    parser.add_argument('-pli', '--pollinterval', type=float, default=_Const.DAEMON_POLL_INTERVAL_SECS, help=r'-m daemon: directory poll interval in seconds when pyinotify is not installed')
     parser.add_argument('-npp', '--noprojprefix', help=r'[Testing use] No project name prefix (i.e. same as repo name)', action='store_true')
     args = parser.parse_args()
     return args
 
 
-def main():
-    args = args_get()
-    args_check(args)
+def get_cksum_store(args):
+    """ The -cks sqlite checksum store (always used by -m cksumimport/cksumexport), or None for JSON checksum files """
+    if args.cksumfolder and (args.cksumstore == _Const.CKSUM_STORE_SQLITE or args.mode in (_Const.MODE_CKSUMIMPORT, _Const.MODE_CKSUMEXPORT)):
+        return ChecksumStore(os.path.join(args.cksumfolder, _Const.CKSUM_STORE_FILENAME))
+    return None
+
 
-    trans_update = TransUpdate(args.transuser, args.transpass, args.reponame, args.noprojprefix, args.clonepath, args.repolocalizeinfo)
+def run_project(args, transifex, project_index, download_list_file, report_writer=None):
+    trans_update = TransUpdate(args.transuser, args.transpass, args.reponame, args.noprojprefix, args.clonepath, args.repolocalizeinfo, args.jobs, args.transurl,
+                               args.hashalgorithm, project_index, transifex, args.parentbranch, get_cksum_store(args))
+    metrics.set_project(trans_update.project_name)
     if args.mode == _Const.MODE_UP:
-        exit_val = trans_update.upload_source_files(args.filelist, args.filehash, args.cksumfolder, args.gitbranch, args.downloadpath)
+        exit_val = trans_update.upload_source_files(args.filelist, args.filehash, args.cksumfolder, args.gitbranch, args.downloadpath,
+                                                    args.gitchanges)
     elif args.mode == _Const.MODE_DOWN:
-        exit_val = trans_update.process_translated_files(args.cksumfolder, args.gitbranch, args.downloadpath, args.download_list_file)
+        exit_val = trans_update.process_translated_files(args.cksumfolder, args.gitbranch, args.downloadpath, download_list_file,
+                                                            args.statsfirst, args.shard, args.shardfolder, args.shardrun, report_writer)
+    elif args.mode == _Const.MODE_MERGE:
+        exit_val = trans_update.merge_shards(args.cksumfolder, args.gitbranch, args.downloadpath, download_list_file, args.shardfolder,
+                                             args.shardrun, args.statsfirst, report_writer)
+    elif args.mode == _Const.MODE_CKSUMIMPORT:
+        exit_val = trans_update.import_cksumfiles(args.cksumfolder, args.gitbranch)
+    elif args.mode == _Const.MODE_CKSUMEXPORT:
+        exit_val = trans_update.export_cksumfiles(args.cksumfolder, args.gitbranch)
     else:
         exit_val = trans_update.write_cksumfile(args.cksumfolder, args.gitbranch, args.downloadpath)
     return exit_val
 
 
+def combine_exit_vals(exit_vals):
+    """ Overall exit code of a multi-project run: an error if any project failed, else changes if any project changed """
+    if _Const.EXIT_ERROR in exit_vals:
+        return _Const.EXIT_ERROR
+    if any(exit_val != _Const.EXIT_OK_NOCHANGES for exit_val in exit_vals):
+        return _Const.EXIT_OK
+    return _Const.EXIT_OK_NOCHANGES
+
+
+def combine_download_lists(download_list_file, project_dlfs):
+    """ Concatenate (and remove) the per-project download list files into download_list_file """
+    dlf_lines = []
+    for project_dlf in project_dlfs:
+        if project_dlf and os.path.exists(project_dlf):
+            with open(project_dlf, "r") as fp:
+                dlf_lines.extend(fp.readlines())
+            os.remove(project_dlf)
+    if download_list_file and dlf_lines:
+        with open(download_list_file, "w") as fp:
+            fp.writelines(dlf_lines)
+
+
+def run_projects(args, transifex, project_indexes, report_writer=None):
+    """
+    Run several projects concurrently over a shared Transifex connection pool.
+    Each project's output is shown as it happens with a '[project]' prefix, a failing project doesn't stop the others,
+    and each project's downloaded file list is appended to the -dlf file.
+    """
+    projects = load_localize_info(args.clonepath, args.repolocalizeinfo)
+    project_names = dict((project_index, args.reponame + projects[project_index].get('proj_suffix', "")) for project_index in project_indexes)
+    sys.stdout = ThreadOutput(sys.stdout)
+
+    def run(project_index):
+        output = PrefixedOutput(sys.stdout._stream, project_names[project_index])
+        set_thread_output(output)
+        project_dlf = "%s.%d" % (args.download_list_file, project_index) if args.download_list_file else None
+        try:
+            exit_val = run_project(args, transifex, project_index, project_dlf, report_writer)
+        except Exception as e:
+            print "%s exception: %s" % (os.path.basename(__file__), e)
+            exit_val = _Const.EXIT_ERROR
+        finally:
+            output.close()
+            set_thread_output(None)
+        return exit_val, project_dlf
+
+    try:
+        results = WorkerPool(len(project_indexes)).map(run, project_indexes)
+    finally:
+        sys.stdout = sys.stdout._stream
+
+    exit_vals = []
+    print
+    for project_index, (exit_val, project_dlf) in zip(project_indexes, results):
+        print "==== Project %s: exit code %d ====" % (project_names[project_index], exit_val)
+        exit_vals.append(exit_val)
+    combine_download_lists(args.download_list_file, [project_dlf for __, project_dlf in results])
+    return combine_exit_vals(exit_vals)
+
+
+def run_daemon(args, transifex, project_indexes):
+    trans_updates = [TransUpdate(args.transuser, args.transpass, args.reponame, args.noprojprefix, args.clonepath, args.repolocalizeinfo,
+                                 args.jobs, args.transurl, args.hashalgorithm, project_index, transifex, args.parentbranch, get_cksum_store(args))
+                     for project_index in project_indexes]
+    sync_daemon = SyncDaemon(trans_updates, args.cksumfolder, args.gitbranch, args.downloadpath, args.download_list_file,
+                             args.statsfirst, args.watchdebounce, args.triggerport, args.pollinterval)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sync_daemon.stop())
+    sys.stdout = ThreadOutput(sys.stdout)
+    try:
+        return sync_daemon.run()
+    except KeyboardInterrupt:
+        return _Const.EXIT_OK
+    finally:
+        sys.stdout = sys.stdout._stream
+
+
+def _raise_keyboard_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def main():
+    args = args_get()
+    args_check(args)
+    if args.mode != _Const.MODE_DAEMON:
+        # a Jenkins abort sends SIGTERM: stop the way Ctrl-C does, so in-flight downloads remove their temp files
+        signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+
+    num_projects = len(load_localize_info(args.clonepath, args.repolocalizeinfo))
+    if args.projectindex is not None:
+        if not 0 <= args.projectindex < num_projects:
+            raise TransUpdateError("ERROR: -pi must be between 0 and %d" % (num_projects - 1))
+        project_indexes = [args.projectindex]
+    else:
+        project_indexes = range(num_projects)
+    transifex = OnTransifexAPI(args.transuser, args.transpass, args.transurl, pool_size=args.jobs * len(project_indexes))
+    report_writer = None
+    if args.reportfile and args.mode in (_Const.MODE_DOWN, _Const.MODE_MERGE):
+        report_writer = ReportWriter(args.reportfile, args.reportformat)
+    exit_val = _Const.EXIT_ERROR
+    try:
+        if args.mode == _Const.MODE_DAEMON:
+            exit_val = run_daemon(args, transifex, project_indexes)
+        elif len(project_indexes) == 1:
+            exit_val = run_project(args, transifex, project_indexes[0], args.download_list_file, report_writer)
+        else:
+            exit_val = run_projects(args, transifex, project_indexes, report_writer)
+    finally:
+        if report_writer:
+            report_writer.close()
+        if args.metricsfile:
+            metrics.write(args.metricsfile, {'repo': args.reponame, 'mode': args.mode, 'branch': args.gitbranch or ""}, exit_val)
+    return exit_val
+
+
 if __name__ == "__main__":
     try:
         exit_val = main()
+    except KeyboardInterrupt:
+        print "%s: interrupted" % os.path.basename(__file__)
+        exit_val = _Const.EXIT_ERROR
     except Exception as e:
         print "%s exception: %s" % (os.path.basename(__file__), e)
         exit_val = _Const.EXIT_ERROR
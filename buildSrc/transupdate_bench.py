@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+"""
+Description:
+Offline throughput benchmark for transupdate.py. Runs -m up, -m down and -m cksumfile against a local Transifex
+stand-in (transifex_mock.py) over synthetic repos of N resources x M languages and reports wall time, requests/sec
+and peak RSS per run.
+
+Usage:
+transupdate_bench.py -n 10,100 -ml 5 -l 0.02 -j 8 -x="-sf"
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from transifex_mock import MockTransifexServer, MockTransifexState
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TRANSUPDATE = os.path.join(SCRIPT_DIR, "transupdate.py")
+REPO_NAME = "bench"
+GIT_BRANCH = "master"
+
+
+def create_synthetic_repo(repo_path, num_resources, num_langs, resource_size):
+    """ Write num_resources English .po files plus a localize.json with num_langs languages """
+    langs = ["x%02d_XX" % i for i in range(num_langs)]
+    res_folder = os.path.join(repo_path, "project", "translations")
+    os.makedirs(res_folder)
+    for i in range(num_resources):
+        lines = []
+        size = 0
+        j = 0
+        while size < resource_size:
+            line = 'msgid "res%04d_%d"\nmsgstr ""\n\n' % (i, j)
+            lines.append(line)
+            size += len(line)
+            j += 1
+        with open(os.path.join(res_folder, "res%04d-en.po" % i), "w") as fp:
+            fp.write("".join(lines))
+    localize_info = {
+        "langs": [{lang: ""} for lang in langs],
+        "resources": [["project/translations/*.po", "-", "en"]]
+        }
+    with open(os.path.join(repo_path, "localize.json"), "w") as fp:
+        json.dump(localize_info, fp)
+    return langs
+
+
+def run_transupdate(mode_args, common_args):
+    """ Run transupdate.py in a child process and return (exit code, wall secs, peak RSS KB) """
+    with open(os.devnull, "w") as devnull:
+        start = time.time()
+        proc = subprocess.Popen([sys.executable, TRANSUPDATE] + mode_args + common_args, stdout=devnull)
+        __, status, rusage = os.wait4(proc.pid, 0)
+        wall = time.time() - start
+    exit_val = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+    return exit_val, wall, rusage.ru_maxrss
+
+
+def run_benchmark(server, args, num_resources, num_langs):
+    work_folder = tempfile.mkdtemp(prefix="transupdate_bench_")
+    try:
+        repo_path = os.path.join(work_folder, "repo")
+        cksum_folder = os.path.join(work_folder, "cksum")
+        os.makedirs(cksum_folder)
+        server.state.langs = create_synthetic_repo(repo_path, num_resources, num_langs, args.resourcesize)
+        transcred = os.path.join(work_folder, "transcred.json")
+        with open(transcred, "w") as fp:
+            json.dump({"username": "bench", "password": "bench"}, fp)
+        common_args = ["-tc", transcred, "-rl", "localize.json", "-rn", REPO_NAME, "-c", repo_path, "-tu", server.url,
+                       "-ckf", cksum_folder, "-gb", GIT_BRANCH, "-j", str(args.jobs)] + args.extra.split()
+        mode_args = {
+            "up": ["-m", "up", "-fl", "all"],
+            "down": ["-m", "down"],
+            "cksumfile": ["-m", "cksumfile"]
+            }
+        results = []
+        for mode in args.modes.split(","):
+            for __ in range(args.repeat):
+                server.state.reset_counters()
+                exit_val, wall, peak_rss = run_transupdate(mode_args[mode], common_args)
+                counters = server.state.counters()
+                results.append({
+                    "mode": mode,
+                    "resources": num_resources,
+                    "langs": num_langs,
+                    "exit_code": exit_val,
+                    "wall_secs": wall,
+                    "requests": counters["total_requests"],
+                    "requests_per_sec": counters["total_requests"] / wall if wall else 0.0,
+                    "bytes_sent": counters["bytes_sent"],
+                    "peak_rss_kb": peak_rss
+                    })
+        return results
+    finally:
+        shutil.rmtree(work_folder)
+
+
+def print_results(results):
+    line_format = "%-12s%-12s%-8s%-8s%-12s%-12s%-14s%s"
+    print line_format % ("Mode", "Resources", "Langs", "Exit", "Wall(s)", "Requests", "Requests/s", "Peak RSS(MB)")
+    for result in results:
+        print line_format % (result["mode"], result["resources"], result["langs"], result["exit_code"],
+                             "%.2f" % result["wall_secs"], result["requests"], "%.1f" % result["requests_per_sec"],
+                             "%.1f" % (result["peak_rss_kb"] / 1024.0))
+
+
+def args_get():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--resources', default="10,100", help=r'Comma separated numbers of English resources, ex: 10,100')
+    parser.add_argument('-ml', '--langs', default="5", help=r'Comma separated numbers of languages, ex: 5,7')
+    parser.add_argument('-ms', '--modes', default="up,down,cksumfile", help=r'Comma separated transupdate.py modes to time (in order)')
+    parser.add_argument('-rs', '--resourcesize', type=int, default=4096, help=r'Size in bytes of each English resource')
+    parser.add_argument('-ps', '--payloadsize', type=int, default=4096, help=r'Size in bytes of each translation download')
+    parser.add_argument('-l', '--latency', type=float, default=0.0, help=r'Mean mock per-request latency in seconds')
+    parser.add_argument('-e', '--errorrate', type=float, default=0.0, help=r'Fraction of mock API requests answered with a 503')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help=r'transupdate.py -j value')
+    parser.add_argument('-r', '--repeat', type=int, default=1, help=r'Runs per mode')
+    parser.add_argument('-x', '--extra', default="", help=r'Extra transupdate.py arguments, ex: -x="-sf"')
+    parser.add_argument('-o', '--output', help=r'Also write the results to this JSON file')
+    parser.add_argument('-p', '--port', type=int, default=0, help=r'Mock server port (default: any free port)')
+    return parser.parse_args()
+
+
+def main():
+    args = args_get()
+    state = MockTransifexState(payload_size=args.payloadsize)
+    server = MockTransifexServer(args.port, state, args.latency, args.errorrate)
+    server.start()
+    results = []
+    try:
+        for num_resources in [int(n) for n in args.resources.split(",")]:
+            for num_langs in [int(m) for m in args.langs.split(",")]:
+                results.extend(run_benchmark(server, args, num_resources, num_langs))
+    finally:
+        server.shutdown()
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+    return 0 if all(result["exit_code"] != 1 for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())